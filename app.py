@@ -173,23 +173,13 @@ app.index_string = '''
 '''
 
 # --- Create Layout and Register Callbacks ---
-app.layout, all_pydeck_layers, dataframes = create_layout()
+app.layout, all_pydeck_layers, datasets = create_layout()
 
 # Callbacks are registered AFTER the layout is fully defined.
-register_map_callbacks(app, all_pydeck_layers, dataframes)
-register_ui_callbacks(app)
-widget_callbacks.register_callbacks(
-    app,
-    dataframes['crime_points'],
-    dataframes['neighbourhoods'],
-    dataframes['network'],
-    dataframes['buildings'],
-    dataframes['land_use'],
-    dataframes['deprivation'],
-    dataframes['population'],
-    dataframes['stop_and_search']
-)
-register_filter_callbacks(app, dataframes['network'])
+register_map_callbacks(app, all_pydeck_layers, datasets)
+register_ui_callbacks(app, datasets)
+widget_callbacks.register_callbacks(app, datasets)
+register_filter_callbacks(app, datasets)
 register_chat_callbacks(app)
 register_settings_callbacks(app)
 
@@ -73,6 +73,109 @@ window.dash_clientside.ui_callbacks = {
     }
 };
 
+// --- Binary map payload decoding ---
+// With DECK_BINARY_TRANSPORT, layer data arrives as {length, binaryColumns} where numeric
+// columns, colours and positions are base64 typed arrays (see utils/deck_payload.py).
+// dash_deck runs the deck through deck.gl's JSON converter, which only understands plain
+// rows, so each layer is expanded into row objects here before it reaches the DeckGL component.
+const DECK_TYPED_ARRAYS = {
+    uint8: Uint8Array,
+    int32: Int32Array,
+    float32: Float32Array,
+    float64: Float64Array
+};
+
+function decodeBase64Buffer(encoded, dtype) {
+    const binary = atob(encoded);
+    const bytes = new Uint8Array(binary.length);
+    for (let i = 0; i < binary.length; i++) {
+        bytes[i] = binary.charCodeAt(i);
+    }
+    return new DECK_TYPED_ARRAYS[dtype](bytes.buffer);
+}
+
+function decodeBinaryColumns(payload) {
+    const length = payload.length;
+    const rows = new Array(length);
+    for (let i = 0; i < length; i++) {
+        rows[i] = {};
+    }
+    Object.entries(payload.binaryColumns).forEach(([name, column]) => {
+        if (column.values) {
+            // Strings and other non-numeric columns are sent as plain JSON values
+            for (let i = 0; i < length; i++) {
+                rows[i][name] = column.values[i];
+            }
+            return;
+        }
+        const values = decodeBase64Buffer(column.data, column.dtype);
+        const size = column.size;
+        if (column.offsets) {
+            // Variable-length lists of vectors (polygon contours): row i owns vectors offsets[i]..offsets[i + 1]
+            const offsets = decodeBase64Buffer(column.offsets, 'int32');
+            for (let i = 0; i < length; i++) {
+                const vectors = new Array(offsets[i + 1] - offsets[i]);
+                for (let v = offsets[i]; v < offsets[i + 1]; v++) {
+                    vectors[v - offsets[i]] = Array.from(values.subarray(v * size, (v + 1) * size));
+                }
+                rows[i][name] = vectors;
+            }
+        } else if (size > 1) {
+            for (let i = 0; i < length; i++) {
+                rows[i][name] = Array.from(values.subarray(i * size, (i + 1) * size));
+            }
+        } else {
+            for (let i = 0; i < length; i++) {
+                rows[i][name] = Number.isNaN(values[i]) ? null : values[i];
+            }
+        }
+    });
+    return rows;
+}
+
+function decodeLayerData(data) {
+    return data && data.binaryColumns ? decodeBinaryColumns(data) : data;
+}
+
+// Last decoded data of every layer, by layer id: {hash, rows}. Map updates send a layer's
+// data as {layerDataHash, layerData}, or just {layerDataHash} when it matches the entry here
+// (see layer_data_envelope in utils/deck_payload.py), so unchanged layers are neither
+// re-sent nor decoded again.
+const deckLayerCache = {};
+
+window.dash_clientside.map_callbacks = {
+    decodeDeckPayload: function(deckJson) {
+        if (!deckJson) {
+            return [window.dash_clientside.no_update, window.dash_clientside.no_update];
+        }
+        const deck = typeof deckJson === 'string' ? JSON.parse(deckJson) : deckJson;
+        deck.layers = (deck.layers || []).filter(layer => {
+            const data = layer.data;
+            if (!data || !data.layerDataHash) {
+                layer.data = decodeLayerData(data);
+                return true;
+            }
+            if ('layerData' in data) {
+                layer.data = decodeLayerData(data.layerData);
+                deckLayerCache[layer.id] = {hash: data.layerDataHash, rows: layer.data};
+                return true;
+            }
+            const cached = deckLayerCache[layer.id];
+            if (cached && cached.hash === data.layerDataHash) {
+                layer.data = cached.rows;
+                return true;
+            }
+            console.warn(`Map layer ${layer.id}: data ${data.layerDataHash} is not cached, skipping it`);
+            return false;
+        });
+        const hashes = {};
+        Object.entries(deckLayerCache).forEach(([layerId, cached]) => {
+            hashes[layerId] = cached.hash;
+        });
+        return [deck, hashes];
+    }
+};
+
 // Inject lightweight CSS to limit the opened dropdown menu height for dropdowns using
 // dropdownClassName='compact-dropdown-menu' so only ~2 rows are visible and a scrollbar appears.
 (function injectCompactDropdownCss() {
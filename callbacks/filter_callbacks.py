@@ -1,9 +1,8 @@
 # callbacks/filter_callbacks.py
 
 from dash.dependencies import Input, Output
-import pandas as pd
 
-def register_callbacks(app, network_df):
+def register_callbacks(app, datasets):
     """
     Registers callbacks that manage the filter controls themselves.
     """
@@ -17,18 +16,13 @@ def register_callbacks(app, network_df):
     def update_network_slider(selected_metric):
         """
         Updates the network range slider's properties based on the selected metric.
+        Uses the precomputed network summary, so the network data need not be loaded.
         """
-        if not selected_metric or selected_metric not in network_df.columns:
-            return 0, 1, [0, 1], {}
-        
-        # Ensure the column is numeric, coercing errors
-        metric_series = pd.to_numeric(network_df[selected_metric], errors='coerce').dropna()
-        
-        if metric_series.empty:
+        metric_ranges = datasets.summary('network')['numeric_ranges'] if 'network' in datasets else {}
+        if not selected_metric or selected_metric not in metric_ranges:
             return 0, 1, [0, 1], {}
 
-        min_val = metric_series.min()
-        max_val = metric_series.max()
+        min_val, max_val = metric_ranges[selected_metric]
 
         # Create marks for the slider
         marks = {
@@ -37,4 +31,3 @@ def register_callbacks(app, network_df):
         }
 
         return min_val, max_val, [min_val, max_val], marks
-
@@ -1,18 +1,29 @@
 # callbacks/map_callbacks.py
 
-from dash.dependencies import Input, Output, State
+from dash.dependencies import Input, Output, State, ClientsideFunction
 from dash import no_update
 import pydeck as pdk
+from pydeck.bindings import json_tools
 import pandas as pd
 import numpy as np
-import jenkspy
-import re 
+import json
+
+from utils.colours import categorical_colours, binned_colours, solid_colours
+from utils.categoricals import category_values
+from utils.bitmap_index import bitmap_rows
+from utils.filter_engine import filter_rows
+from utils.deck_payload import encode_layer_data, layer_properties, layer_data_hash, layer_data_envelope
+from utils.lru_cache import ByteLRUCache
+from utils.month_index import slider_month_range
+from utils.jenks import natural_breaks
+from utils.quantiles import column_quantiles, quantile_classes
+from utils.session_store import get_session_store
 
 # Ensure all necessary configs are imported
 from config import (
     INITIAL_VIEW_STATE_CONFIG, LAYER_CONFIG, FLOOD_LAYER_CONFIG, 
     BUILDING_COLOR_CONFIG, FLOOD_HAZARD_COLORS, 
-    STOP_AND_SEARCH_COLOR_MAP, CRIME_COLOR_MAP 
+    STOP_AND_SEARCH_COLOR_MAP, CRIME_COLOR_MAP, LAYER_CACHE_MAX_BYTES
 )
 
 # --- UTILITY FUNCTION: Converts HEX to RGB list with Alpha ---
@@ -62,24 +73,41 @@ def get_color_gradient(base_rgb, steps, output_hex=True, light_mix=0.1):
         return [list(rgb) + [220] for rgb in gradient_rgb]
 
 
-def register_callbacks(app, all_layers, dataframes):
+def register_callbacks(app, all_layers, datasets):
     """
     Registers all map-related callbacks to the Dash app.
     """
+    # RGBA lookups for the categorical layers, built once
+    crime_rgba = {crime_type: hex_to_rgba(hex_color) for crime_type, hex_color in CRIME_COLOR_MAP.items()}
+    sas_rgba = {obj: hex_to_rgba(hex_color) for obj, hex_color in STOP_AND_SEARCH_COLOR_MAP.items()}
+    # Serialised layer data by (layer, data version, filter and tooltip state), so map updates
+    # that only change the basemap or other layers reuse it
+    layer_cache = ByteLRUCache(LAYER_CACHE_MAX_BYTES)
+
     @app.callback(
-        [Output("deck-gl", "data"), Output("deck-gl", "tooltip"), Output("layers-loading-output", "children")],
+        [Output("deck-payload-store", "data"), Output("deck-gl", "tooltip"), Output("layers-loading-output", "children")],
         [Input("map-update-trigger-store", "data")],
-        [State("month-map-store", "data"), State("sas-month-map-store", "data")],
+        [State("month-map-store", "data"), State("sas-month-map-store", "data"), State("deck-layer-hashes-store", "data")],
         prevent_initial_call=True
     )
-    def update_map_view(trigger_data, crime_month_map, sas_month_map):
+    def update_map_view(trigger_key, crime_month_map_key, sas_month_map_key, client_layer_hashes):
+        session_store = get_session_store()
+        trigger_data = session_store.get(trigger_key)
         if not trigger_data:
             return no_update, no_update
+        crime_month_map, sas_month_map = session_store.get(crime_month_map_key), session_store.get(sas_month_map_key)
+
+        def selected_rows(mask):
+            # None selects every row
+            return None if mask is None else bitmap_rows(mask)
+
+        def take(values, rows):
+            values = values.to_numpy() if isinstance(values, pd.Series) else values
+            return values if rows is None else values[rows]
 
-        def sanitize_data_for_json(df):
-            df_copy = df.copy()
-            df_copy.replace({pd.NA: None, np.nan: None, pd.NaT: None}, inplace=True)
-            return df_copy.to_dict('records')
+        def fill_missing(values, fill):
+            missing = pd.isna(values)
+            return np.where(missing, fill, values) if missing.any() else values
 
         map_style = trigger_data["map_style"]
         crime_viz_selection = trigger_data["crime_viz"]
@@ -93,44 +121,131 @@ def register_callbacks(app, all_layers, dataframes):
         deprivation_category, selected_land_use, flood_selection, \
         building_color_metric, selected_neighbourhoods, sas_object_search, sas_time_range = trigger_data["states"]
 
-        visible_layers = []
-        
         master_layer_order = list(LAYER_CONFIG.keys()) + list(FLOOD_LAYER_CONFIG.keys())
 
-        for layer_id in master_layer_order:
-            if layer_id not in all_layers:
+        def is_requested(layer_id):
+            if layer_id.startswith('crime_'):
+                return crime_viz_selection == layer_id
+            if layer_id in FLOOD_LAYER_CONFIG:
+                return bool(flooding_toggle and flood_selection and FLOOD_LAYER_CONFIG[layer_id].get('id') in flood_selection)
+            return bool(toggles_dict.get(layer_id))
+
+        # Only touch (and, for hidden layers, load) the data of layers that are switched on
+        requested_layers = [
+            layer_id for layer_id in master_layer_order
+            if layer_id in all_layers and is_requested(layer_id) and not datasets[layer_id].empty
+        ]
+        visible_layer_ids = [all_layers[layer_id][1]['id'] for layer_id in requested_layers]
+
+        # --- Tooltip columns selection: per-layer ---
+        tooltip_columns_per_layer = trigger_data.get('tooltip_columns_per_layer', [])
+        # Get the layer order to match dropdowns to layers
+        all_configs = {**LAYER_CONFIG, **FLOOD_LAYER_CONFIG}
+        # Use config 'id' values (these become the pydeck layer.id) so keys match the Deck layers
+        sorted_layer_ids = [config.get('id', layer_key) for layer_key, config in sorted(all_configs.items(), key=lambda item: item[1].get('label', item[0])) if 'file_path' in config]
+
+        # Build a dict keyed by the pydeck layer id: {pydeck_layer_id: [selected columns]}
+        tooltip_columns_dict = {
+            sorted_layer_ids[i]: (tooltip_columns_per_layer[i] if i < len(tooltip_columns_per_layer) and tooltip_columns_per_layer[i] else [])
+            for i in range(len(sorted_layer_ids))
+        }
+
+        # Find the topmost visible layer with a tooltip selection
+        deck_tooltip = True
+        for pydeck_layer_id in reversed(visible_layer_ids):
+            selected_cols = tooltip_columns_dict.get(pydeck_layer_id, [])
+            if selected_cols:
+                tooltip_text = "<br/>".join([f"<b>{col}:</b> {{{col}}}" for col in selected_cols])
+                deck_tooltip = {"html": tooltip_text}
+                break
+        else:
+            # Fallback to per-layer config or default
+            active_tooltip = None
+            for pydeck_layer_id in reversed(visible_layer_ids):
+                layer_key = next((k for k, v in all_configs.items() if v.get('id') == pydeck_layer_id), None)
+                if layer_key:
+                    config = all_configs[layer_key]
+                    tooltip_config = config.get("tooltip")
+                    if tooltip_config:
+                        active_tooltip = tooltip_config
+                        break
+            deck_tooltip = active_tooltip if active_tooltip else True
+
+        # Respect the global "show_tooltips" flag if present in the trigger data
+        show_tooltips = False
+        try:
+            show_tooltips = bool(trigger_data.get('show_tooltips', False))
+        except Exception:
+            show_tooltips = False
+
+        if not show_tooltips:
+            deck_tooltip = False
+
+        # The trigger states each layer's rows, colours and args depend on; layers not
+        # listed depend on none, so only a data reload or a tooltip change rebuilds them
+        layer_states = {
+            'crime_points': [time_range, selected_crime_types, crime_month_map],
+            'crime_heatmap': [time_range, selected_crime_types, crime_month_map],
+            'buildings': building_color_metric,
+            'stop_and_search': [sas_object_search, sas_time_range, sas_month_map],
+            'network': [network_metric, network_range],
+            'deprivation': deprivation_category,
+            'land_use': selected_land_use,
+            'neighbourhoods': selected_neighbourhoods
+        }
+
+        visible_layers = []
+        # Serialised data of each visible layer, spliced into the deck JSON in place of its placeholder.
+        # Layers whose data the browser already holds (by hash, see decodeDeckPayload) are sent as the hash only
+        layer_data_json = []
+        client_layer_hashes = client_layer_hashes or {}
+
+        def add_layer(layer_type, layer_args, data_json, data_hash):
+            placeholder = f"__layer_data_{len(layer_data_json)}__"
+            visible_layers.append(pdk.Layer(layer_type, **{**layer_args, 'data': placeholder}))
+            layer_data_json.append((placeholder, layer_data_envelope(data_json, data_hash, client_layer_hashes.get(layer_args['id']))))
+
+        for layer_id in requested_layers:
+            pydeck_layer_id = all_layers[layer_id][1]['id']
+            cache_key = (
+                layer_id, datasets.data_version(layer_id),
+                json.dumps([layer_states.get(layer_id), deck_tooltip, tooltip_columns_dict.get(pydeck_layer_id, [])], sort_keys=True, default=str)
+            )
+            cached = layer_cache.get(cache_key)
+            if cached is not None:
+                add_layer(*cached)
                 continue
 
             layer_type, original_args = all_layers[layer_id]
             new_layer_args = original_args.copy()
-            df_to_process = dataframes[layer_id].copy()
+            # The registry frame is never modified or copied here: filters select a
+            # row bitmap over it (shared with the widget callbacks, see utils/filter_engine.py)
+            # and derived columns are kept as side arrays aligned to the selected rows,
+            # until the rendered rows are serialised
+            base = datasets[layer_id]
+            mask = None
+            columns = {}
             
             should_render = False
 
             if layer_id.startswith('crime_'):
                 if crime_viz_selection == layer_id:
                     should_render = True
-                    if time_range and isinstance(time_range, list) and len(time_range) == 2 and crime_month_map:
-                        start_month_str, end_month_str = crime_month_map.get(str(time_range[0])), crime_month_map.get(str(time_range[1]))
-                        if start_month_str and end_month_str:
-                            df_to_process['Month_dt'] = pd.to_datetime(df_to_process['Month'], errors='coerce')
-                            start_date, end_date = pd.to_datetime(start_month_str), pd.to_datetime(end_month_str)
-                            df_to_process = df_to_process[(df_to_process['Month_dt'] >= start_date) & (df_to_process['Month_dt'] <= end_date)]
-                    if selected_crime_types:
-                        df_to_process = df_to_process[df_to_process['Crime type'].isin(selected_crime_types)]
+                    mask = filter_rows(
+                        datasets, layer_id, months=slider_month_range(time_range, crime_month_map), isin={'Crime type': selected_crime_types or None}
+                    )
+                    rows = selected_rows(mask)
                         
                     # --- CRIME POINTS COLORING & ZOOM SCALING ---
                     if layer_id == 'crime_points':
                         
-                        # Handle null values in 'Crime type' for coloring
-                        df_to_process['Crime type'] = df_to_process['Crime type'].fillna('None')
+                        # Show missing crime types as 'None' (built only if the column is sent)
+                        columns['Crime type'] = lambda base=base, rows=rows: fill_missing(take(base['Crime type'], rows), 'None')
 
-                        # Map the crime type to the correct HEX color, then convert to RGBA
-                        def get_crime_color(crime_type):
-                            hex_color = CRIME_COLOR_MAP.get(crime_type, CRIME_COLOR_MAP['None'])
-                            return hex_to_rgba(hex_color)
-
-                        df_to_process['color'] = df_to_process['Crime type'].apply(get_crime_color)
+                        # Map the crime type to the correct RGBA colour (codes cached on the registry frame)
+                        columns['color'] = categorical_colours(
+                            base, 'Crime type', lambda crime_type: crime_rgba.get(crime_type, crime_rgba['None']), crime_rgba['None'], rows=rows, cached=True
+                        )
                         new_layer_args['get_fill_color'] = 'color'
                         
                         # Use meters for zoom scaling
@@ -140,48 +255,11 @@ def register_callbacks(app, all_layers, dataframes):
                     # --- END CRIME POINTS ---
             
             elif layer_id in FLOOD_LAYER_CONFIG:
-                # NEW: Granular flood layer handling with hazard levels
-                layer_config = FLOOD_LAYER_CONFIG[layer_id]
-                hazard_level = layer_config.get('hazard_level')
-                hazard_type = layer_config.get('hazard_type')
-                layer_config_id = layer_config.get('id')
-                
-                if flooding_toggle and flood_selection and layer_config_id in flood_selection:
-                    should_render = True
-                    
-                    # Filter dataframe by hazard level from the database
-                    if hazard_level and 'hazard_level' in df_to_process.columns:
-                        df_to_process = df_to_process[
-                            df_to_process['hazard_level'].str.lower() == hazard_level.lower()
-                        ]
-                    
-                    # Apply color based on 'risk' column value if available, otherwise use hazard level
-                    if 'risk' in df_to_process.columns and hazard_type in FLOOD_HAZARD_COLORS:
-                        def get_flood_risk_color(risk_value):
-                            """Map risk value to color with transparency"""
-                            risk_str = str(risk_value).lower().strip()
-                            color_map = FLOOD_HAZARD_COLORS.get(hazard_type, {})
-                            
-                            # Try to match risk value to a color
-                            if risk_str in color_map:
-                                color = list(color_map[risk_str])
-                            else:
-                                # Fallback to hazard_level color if risk doesn't match
-                                color = list(color_map.get(hazard_level, [128, 128, 128, 255]))
-                            
-                            # Set alpha to 150 for transparency
-                            color[3] = 150
-                            return color
-                        
-                        df_to_process['color'] = df_to_process['risk'].apply(get_flood_risk_color)
-                        new_layer_args['get_fill_color'] = 'color'
-                    else:
-                        # Fallback: apply color based on hazard level
-                        if hazard_type and hazard_level in FLOOD_HAZARD_COLORS.get(hazard_type, {}):
-                            color = list(FLOOD_HAZARD_COLORS[hazard_type][hazard_level])
-                            color[3] = 150
-                            df_to_process['color'] = [color] * len(df_to_process)
-                            new_layer_args['get_fill_color'] = 'color'
+                # Each flood layer is its hazard level's partition of the source file,
+                # already coloured by risk at load (see partition_flood_layers)
+                should_render = True
+                if 'color' in base.columns:
+                    new_layer_args['get_fill_color'] = 'color'
             
             elif layer_id in LAYER_CONFIG:
                 if toggles_dict.get(layer_id):
@@ -199,17 +277,17 @@ def register_callbacks(app, all_layers, dataframes):
 
                     # FIXED: Added population layer coloring with 10 Jenks breaks
                     if layer_id == 'population':
-                        if 'density' in df_to_process.columns:
-                            density_series = pd.to_numeric(df_to_process['density'], errors='coerce').dropna()
+                        if 'density' in base.columns:
+                            density_series = pd.to_numeric(base['density'], errors='coerce').dropna()
                             if not density_series.empty and len(density_series.unique()) >= 2:
                                 try:
-                                    # Calculate 10 Jenks breaks
-                                    breaks = jenkspy.jenks_breaks(density_series, n_classes=10)
+                                    # Calculate 10 Jenks breaks (natural_breaks reports their goodness of fit)
+                                    breaks, _ = natural_breaks(density_series, 10)
                                     unique_breaks = sorted(list(set(breaks)))
                                     
                                     # Assign each area to a break class (0-9)
-                                    df_to_process['jenks_class'] = pd.cut(
-                                        df_to_process['density'], 
+                                    jenks_class = pd.cut(
+                                        base['density'], 
                                         bins=unique_breaks, 
                                         labels=False, 
                                         include_lowest=True
@@ -231,8 +309,9 @@ def register_callbacks(app, all_layers, dataframes):
                                     
                                     # Map class to color with alpha
                                     color_palette.reverse()
-                                    df_to_process['color'] = df_to_process['jenks_class'].apply(
-                                        lambda c: color_palette[int(c)] + [180] if pd.notna(c) else [200, 200, 200, 100]
+                                    columns['jenks_class'] = take(jenks_class, None)
+                                    columns['color'] = binned_colours(
+                                        columns['jenks_class'], [color + [180] for color in color_palette], [200, 200, 200, 100]
                                     )
                                     new_layer_args['get_fill_color'] = 'color'
                                 except Exception as e:
@@ -248,33 +327,28 @@ def register_callbacks(app, all_layers, dataframes):
                             def get_building_color(risk_level):
                                 risk_level_str = str(risk_level).lower()
                                 return colors.get(risk_level_str, white_color)
-                            if column_name in df_to_process.columns:
-                                df_to_process['color'] = df_to_process[column_name].apply(get_building_color)
+                            if column_name in base.columns:
+                                columns['color'] = categorical_colours(
+                                    base, column_name, get_building_color, get_building_color(None), cached=True
+                                )
                                 new_layer_args['get_fill_color'] = 'color'
                         else:
                             new_layer_args['get_fill_color'] = BUILDING_COLOR_CONFIG['none']['color']
 
                     elif layer_id == 'stop_and_search':
                         # --- STOP AND SEARCH COLORING LOGIC ---
-                        if sas_time_range and isinstance(sas_time_range, list) and len(sas_time_range) == 2 and sas_month_map:
-                            df_to_process['Month_dt'] = pd.to_datetime(df_to_process['Date'], errors='coerce').dt.tz_localize(None)
-                            start_month_str, end_month_str = sas_month_map.get(str(sas_time_range[0])), sas_month_map.get(str(sas_time_range[1]))
-                            if start_month_str and end_month_str:
-                                start_date, end_date = pd.to_datetime(start_month_str), pd.to_datetime(end_month_str)
-                                df_to_process = df_to_process[(df_to_process['Month_dt'] >= start_date) & (df_to_process['Month_dt'] <= end_date)]
+                        mask = filter_rows(
+                            datasets, layer_id, months=slider_month_range(sas_time_range, sas_month_map), isin={'Object of search': sas_object_search or None}
+                        )
+                        rows = selected_rows(mask)
                         
-                        if sas_object_search:
-                            df_to_process = df_to_process[df_to_process['Object of search'].isin(sas_object_search)]
-                        
-                        # Handle null values in 'Object of search' for coloring
-                        df_to_process['Object of search'] = df_to_process['Object of search'].fillna('None')
-
-                        # Map the object of search to the correct HEX color, then convert to RGBA
-                        def get_sas_color(object_of_search):
-                            hex_color = STOP_AND_SEARCH_COLOR_MAP.get(object_of_search, STOP_AND_SEARCH_COLOR_MAP['None'])
-                            return hex_to_rgba(hex_color)
+                        # Show missing objects of search as 'None' (built only if the column is sent)
+                        columns['Object of search'] = lambda base=base, rows=rows: fill_missing(take(base['Object of search'], rows), 'None')
 
-                        df_to_process['color'] = df_to_process['Object of search'].apply(get_sas_color)
+                        # Map the object of search to the correct RGBA colour (codes cached on the registry frame)
+                        columns['color'] = categorical_colours(
+                            base, 'Object of search', lambda obj: sas_rgba.get(obj, sas_rgba['None']), sas_rgba['None'], rows=rows, cached=True
+                        )
                         new_layer_args['get_fill_color'] = 'color'
                         
                         # Set radius to scale with zoom
@@ -284,17 +358,20 @@ def register_callbacks(app, all_layers, dataframes):
                     
                     # --- NETWORK ANALYSIS COLORING & LINE WIDTH ---
                     elif layer_id == 'network' and network_metric and network_range:
-                        if network_metric in df_to_process.columns:
-                            df_to_process[network_metric] = pd.to_numeric(df_to_process[network_metric], errors='coerce')
-                            mask = (df_to_process[network_metric] >= network_range[0]) & (df_to_process[network_metric] <= network_range[1])
-                            df_to_process = df_to_process[mask]
-                            metric_series = df_to_process[network_metric].dropna()
+                        if network_metric in base.columns:
+                            metric_values = pd.to_numeric(base[network_metric], errors='coerce')
+                            mask = filter_rows(datasets, layer_id, between={network_metric: network_range})
+                            rows = selected_rows(mask)
+                            if not pd.api.types.is_numeric_dtype(base[network_metric]):
+                                columns[network_metric] = take(metric_values, rows)
+                            # The range test already excludes missing values
+                            metric_series = metric_values.iloc[rows]
                             
                             if not metric_series.empty:
                                 try:
-                                    # Calculate deciles
-                                    decile_labels = pd.qcut(metric_series, 10, labels=False, duplicates='drop')
-                                    df_to_process['decile'] = decile_labels
+                                    # Decile edges of the metric's range, the same ones the network histogram is coloured by
+                                    decile_edges = column_quantiles(base, network_metric).decile_edges(network_range)
+                                    columns['decile'] = quantile_classes(metric_series, decile_edges)
                                     
                                     num_deciles = 10
                                     
@@ -327,12 +404,12 @@ def register_callbacks(app, all_layers, dataframes):
                                         decile_colors = [list(tuple(int(h.lstrip('#')[i:i+2], 16) for i in (0, 2, 4))) + [220] for h in rainbow_hex]
                                     
                                     # Apply the colors
-                                    df_to_process['color'] = df_to_process['decile'].apply(
-                                        lambda d: decile_colors[int(d)] if pd.notna(d) else [128, 128, 128, 150]
+                                    columns['color'] = binned_colours(
+                                        columns['decile'], decile_colors, [128, 128, 128, 150]
                                     )
-                                    df_to_process['value'] = metric_series; df_to_process['metric'] = network_metric
+                                    columns['value'] = take(metric_series, None); columns['metric'] = network_metric
                                 except (ValueError, IndexError):
-                                    df_to_process['color'] = [[128, 128, 128, 150]] * len(df_to_process)
+                                    columns['color'] = solid_colours([128, 128, 128, 150], len(metric_series))
                                 
                                 # Apply line width for analysis network (CORRECTED PathLayer PARAMETERS)
                                 new_layer_args['get_color'] = 'color' 
@@ -347,77 +424,43 @@ def register_callbacks(app, all_layers, dataframes):
                         category_col = "Household deprivation (6 categories)"
                         if deprivation_category == '4+':
                             keywords = ['four', 'five', 'six']
-                            mask = df_to_process[category_col].str.contains('|'.join(keywords), na=False, case=False)
-                            df_to_process = df_to_process[mask]
+                            categories = category_values(base[category_col], lambda categories: categories.str.contains('|'.join(keywords), case=False))
                         else:
-                            df_to_process = df_to_process[df_to_process[category_col] == deprivation_category]
+                            categories = [deprivation_category]
+                        mask = filter_rows(datasets, layer_id, isin={category_col: categories})
 
                     elif layer_id == 'land_use' and selected_land_use:
-                        df_to_process = df_to_process[df_to_process['landuse_text'].isin(selected_land_use)]
+                        mask = filter_rows(datasets, layer_id, isin={'landuse_text': selected_land_use})
                     
                     elif layer_id == 'neighbourhoods' and selected_neighbourhoods:
-                        df_to_process = df_to_process[df_to_process['NAME'].isin(selected_neighbourhoods)]
+                        mask = filter_rows(datasets, layer_id, isin={'NAME': selected_neighbourhoods})
 
             if should_render:
-                new_layer_args['data'] = sanitize_data_for_json(df_to_process)
-                visible_layers.append(pdk.Layer(layer_type, **new_layer_args))
+                # Each layer only sends the columns its accessors, the active tooltip and its own tooltip selection use
+                properties = layer_properties(new_layer_args, deck_tooltip, tooltip_columns_dict.get(pydeck_layer_id, []))
+                data_json = json.dumps(encode_layer_data(base, selected_rows(mask), columns, properties), default=json_tools.default_serialize)
+                cached = (layer_type, new_layer_args, data_json, layer_data_hash(data_json))
+                layer_cache.put(cache_key, cached, len(data_json))
+                add_layer(*cached)
 
         view_config = INITIAL_VIEW_STATE_CONFIG.copy()
         updated_view_state = pdk.ViewState(**view_config, transition_duration=250)
-        
-
-
-        # --- Tooltip columns selection: per-layer ---
-        tooltip_columns_per_layer = trigger_data.get('tooltip_columns_per_layer', [])
-        # Get the layer order to match dropdowns to layers
-        all_configs = {**LAYER_CONFIG, **FLOOD_LAYER_CONFIG}
-        # Use config 'id' values (these become the pydeck layer.id) so keys match the Deck layers
-        sorted_layer_ids = [config.get('id', layer_key) for layer_key, config in sorted(all_configs.items(), key=lambda item: item[1].get('label', item[0])) if 'file_path' in config]
-
-        # Build a dict keyed by the pydeck layer id: {pydeck_layer_id: [selected columns]}
-        tooltip_columns_dict = {
-            sorted_layer_ids[i]: (tooltip_columns_per_layer[i] if i < len(tooltip_columns_per_layer) and tooltip_columns_per_layer[i] else [])
-            for i in range(len(sorted_layer_ids))
-        }
-
-        # Find the topmost visible layer with a tooltip selection
-        deck_tooltip = True
-        for layer in reversed(visible_layers):
-            if hasattr(layer, 'id'):
-                layer_id = layer.id
-                selected_cols = tooltip_columns_dict.get(layer_id, [])
-                if selected_cols:
-                    tooltip_text = "<br/>".join([f"<b>{col}:</b> {{{col}}}" for col in selected_cols])
-                    deck_tooltip = {"html": tooltip_text}
-                    break
-        else:
-            # Fallback to per-layer config or default
-            active_tooltip = None
-            for layer in reversed(visible_layers):
-                if hasattr(layer, 'id'):
-                    layer_id = layer.id
-                    layer_key = next((k for k, v in all_configs.items() if v.get('id') == layer_id), None)
-                    if layer_key:
-                        config = all_configs[layer_key]
-                        tooltip_config = config.get("tooltip")
-                        if tooltip_config:
-                            active_tooltip = tooltip_config
-                            break
-            deck_tooltip = active_tooltip if active_tooltip else True
-
-        # Respect the global "show_tooltips" flag if present in the trigger data
-        show_tooltips = False
-        try:
-            show_tooltips = bool(trigger_data.get('show_tooltips', False))
-        except Exception:
-            show_tooltips = False
-
-        if not show_tooltips:
-            deck_tooltip = False
 
         deck = pdk.Deck(layers=visible_layers, initial_view_state=updated_view_state, map_style=map_style, tooltip=deck_tooltip)
+        deck_json = deck.to_json()
+        for placeholder, data_json in layer_data_json:
+            deck_json = deck_json.replace(json.dumps(placeholder), data_json, 1)
 
-        # Return both the deck JSON (data) and the DeckGL tooltip prop so the front-end control
+        # Return both the deck JSON (decoded into the DeckGL data clientside) and the DeckGL tooltip prop so the front-end control
         # (dash_deck.DeckGL tooltip prop) is updated. This ensures toggling works at runtime because
         # the DeckGL component's own `tooltip` prop can override the JSON payload.
-        return deck.to_json(), deck_tooltip, None
\ No newline at end of file
+        return deck_json, deck_tooltip, None
+
+    # Expands binary layer columns into rows (reusing the browser's copy of unchanged layers)
+    # before the deck reaches the DeckGL component, and reports the layer data hashes it now holds
+    app.clientside_callback(
+        ClientsideFunction(namespace='map_callbacks', function_name='decodeDeckPayload'),
+        Output("deck-gl", "data"),
+        Output("deck-layer-hashes-store", "data"),
+        Input("deck-payload-store", "data")
+    )
@@ -3,9 +3,10 @@
 from dash.dependencies import Input, Output, State, ALL
 # --- MODIFIED: Import ClientsideFunction ---
 from dash import no_update, ctx, ClientsideFunction
-from config import MAP_STYLES, LAYER_CONFIG
+from config import MAP_STYLES, LAYER_CONFIG, FLOOD_LAYER_CONFIG
+from utils.session_store import get_session_store
 
-def register_callbacks(app):
+def register_callbacks(app, datasets):
     # Dynamically populate each layer's tooltip columns dropdown
     @app.callback(
         Output({'type': 'tooltip-columns-dropdown', 'index': ALL}, 'options'),
@@ -13,41 +14,23 @@ def register_callbacks(app):
         prevent_initial_call=False
     )
     def populate_tooltip_columns_all(modal_class):
-        import os
-        from config import LAYER_CONFIG, FLOOD_LAYER_CONFIG
-        from utils.geojson_loader import process_geojson_features
         all_configs = {**LAYER_CONFIG, **FLOOD_LAYER_CONFIG}
         # Use the same sort as create_settings_modal to ensure order matches the created dropdowns
         sorted_configs = sorted(all_configs.items(), key=lambda item: item[1].get('label', item[0]))
         options_list = []
-        import pandas as pd
         for layer_id, config in sorted_configs:
             if 'file_path' not in config:
                 continue
-            file_path = config.get('file_path')
-            df = None
-            # Prefer parquet if it exists (fast path), otherwise fall back to GeoJSON loader
-            parquet_path = None
-            if isinstance(file_path, str) and file_path.endswith('.geojson'):
-                parquet_path = file_path.replace('.geojson', '.parquet')
-
+            # Columns come from the dataset summary, so unloaded layers stay unloaded
             try:
-                if parquet_path and os.path.exists(parquet_path):
-                    # Read parquet table
-                    df = pd.read_parquet(parquet_path)
-                elif file_path and os.path.exists(file_path):
-                    if isinstance(file_path, str) and file_path.endswith('.parquet'):
-                        df = pd.read_parquet(file_path)
-                    else:
-                        # Use the app's GeoJSON loader to ensure consistent processing
-                        df = process_geojson_features(file_path)
+                summary = datasets.summary(layer_id) if layer_id in datasets else None
             except Exception:
-                df = None
+                summary = None
 
-            if df is not None and not df.empty:
+            if summary and summary['rows'] > 0:
                 options = [
                     {"label": col, "value": col}
-                    for col in df.columns if not col.lower().startswith('geometry')
+                    for col in summary['columns'] if not col.lower().startswith('geometry')
                 ]
                 options_list.append(options)
             else:
@@ -57,6 +40,8 @@ def register_callbacks(app):
     Registers all UI-related callbacks to the Dash app.
     """
     other_layer_ids = [k for k, v in LAYER_CONFIG.items() if not k.startswith('crime_')]
+    # Datasets to load when a toggle is switched on, if it does not map to a single layer
+    toggle_datasets = {'flooding_toggle': list(FLOOD_LAYER_CONFIG.keys())}
     layer_toggle_inputs = [Input(f"{layer_id}-toggle", "value") for layer_id in other_layer_ids]
 
     @app.callback(
@@ -98,14 +83,15 @@ def register_callbacks(app):
             show_tooltips = bool(show_tooltips_n and show_tooltips_n % 2 == 1)
             toggle_values = args[:-(num_states + 2)]
             state_values = args[-num_states:]
-        return {
+        # The trigger is kept server-side; the store only carries its key (see utils/session_store.py)
+        return get_session_store().put({
             "map_style": map_style,
             "crime_viz": crime_viz,
             "toggles": toggle_values,
             "states": state_values,
             "show_tooltips": show_tooltips,
             "tooltip_columns_per_layer": tooltip_columns_per_layer
-        }
+        })
 
     @app.callback(
         Output('show-tooltips-toggle', 'children'),
@@ -176,6 +162,10 @@ def register_callbacks(app):
                 new_values[clicked_idx] = []
         else:
             new_values[clicked_idx] = [clicked_layer_id] if not states[clicked_idx] else []
+
+        # Load the layer's data on first use, before the map update that this toggle triggers
+        if new_values[clicked_idx] and not states[clicked_idx]:
+            datasets.load(toggle_datasets.get(clicked_layer_id, [clicked_layer_id]))
             
         new_classnames = [f"layer-button{' selected' if val else ''}" for val in new_values]
         return new_classnames + new_values
@@ -190,6 +180,7 @@ def register_callbacks(app):
     )
     def toggle_crime_layers(n_clicks, current_value):
         if not current_value:
+            datasets.load([k for k in LAYER_CONFIG if k.startswith('crime_')])
             new_value = ['crimes_on']
             className = 'layer-button selected'
             style = {'display': 'block', 'paddingLeft': '20px', 'marginTop': '10px'}
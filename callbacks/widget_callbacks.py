@@ -6,9 +6,15 @@ from dash import no_update, ctx, html, dcc
 import pandas as pd
 import json
 
-from config import LAYER_CONFIG
-from utils.geometry import is_point_in_polygon
+from config import LAYER_CONFIG, NEIGHBOURHOOD_COLUMN, CRIME_CUBE_COLUMNS, SAS_CUBE_COLUMNS
 from utils.colours import get_crime_colour_map
+from utils.categoricals import category_values
+from utils.bitmap_index import bitmap_rows
+from utils.filter_engine import filter_rows
+from utils.month_index import slider_month_range
+from utils.session_store import get_session_store
+from utils.count_cube import count_cube, MONTH_AXIS
+from utils.quantiles import column_quantiles
 from components.crime_widget import create_crime_histogram_figure
 from components.network_widget import create_network_histogram_figure
 from components.flood_risk_widget import create_flood_risk_chart
@@ -19,11 +25,11 @@ from components.deprivation_widget import create_deprivation_bar_chart
 from components.population_widget import create_combined_population_widget
 from components.stop_and_search_widget import create_stop_and_search_histogram_figure
 from components.sas_gender_widget import create_sas_gender_pie_chart
-from shapely.geometry import Point, Polygon
 
-def register_callbacks(app, crime_df, neighbourhoods_df, network_df, buildings_df, land_use_df, deprivation_df, population_df, stop_and_search_df):
+def register_callbacks(app, datasets):
     """
-    Registers all widget-related callbacks.
+    Registers all widget-related callbacks. Frames are fetched from the dataset
+    registry when a callback runs, so hidden layers load only once they are used.
     """
     plotly_colour_map, _ = get_crime_colour_map()
 
@@ -43,9 +49,11 @@ def register_callbacks(app, crime_df, neighbourhoods_df, network_df, buildings_d
         State("sas-month-map-store", "data"),
         prevent_initial_call=True
     )
-    def update_widget_panel(trigger_data, sas_month_map):
+    def update_widget_panel(trigger_key, sas_month_map_key):
+        trigger_data = get_session_store().get(trigger_key)
         if not trigger_data:
             return no_update
+        sas_month_map = get_session_store().get(sas_month_map_key)
 
         crime_viz_selection = trigger_data.get("crime_viz")
         toggles_dict = map_toggles(trigger_data)
@@ -59,20 +67,18 @@ def register_callbacks(app, crime_df, neighbourhoods_df, network_df, buildings_d
         # --- Stop & Search Widgets ---
         if toggles_dict.get('stop_and_search'):
             
-            filtered_sas_df = stop_and_search_df.copy()
+            sas_cube = count_cube(datasets['stop_and_search'], SAS_CUBE_COLUMNS)
             
-            if sas_time_range and sas_month_map:
-                start_month_str, end_month_str = sas_month_map.get(str(sas_time_range[0])), sas_month_map.get(str(sas_time_range[1]))
-                if start_month_str and end_month_str:
-                    filtered_sas_df['Month_dt'] = pd.to_datetime(filtered_sas_df['Date'], errors='coerce').dt.to_period('M').dt.to_timestamp()
-                    start_date, end_date = pd.to_datetime(start_month_str), pd.to_datetime(end_month_str)
-                    filtered_sas_df = filtered_sas_df[(filtered_sas_df['Month_dt'] >= start_date) & (filtered_sas_df['Month_dt'] <= end_date)]
-
-            if selected_sas_objects:
-                filtered_sas_df = filtered_sas_df[filtered_sas_df['Object of search'].isin(selected_sas_objects)]
-
-            sas_fig = create_stop_and_search_histogram_figure(filtered_sas_df)
-            sas_gender_fig = create_sas_gender_pie_chart(filtered_sas_df)
+            # Both charts are summed from slices of the month x object x gender x neighbourhood count cube;
+            # a chart whose column the data lacks gets no counts and shows its "no data" figure
+            month_range, filters = slider_month_range(sas_time_range, sas_month_map), {}
+            if selected_sas_objects and 'Object of search' in sas_cube.columns:
+                filters['Object of search'] = selected_sas_objects
+
+            monthly_events = sas_cube.counts([MONTH_AXIS, 'Object of search'], month_range, filters) if 'Object of search' in sas_cube.columns else pd.DataFrame()
+            gender_counts = sas_cube.counts(['Gender'], month_range, filters) if 'Gender' in sas_cube.columns else pd.DataFrame()
+            sas_fig = create_stop_and_search_histogram_figure(monthly_events)
+            sas_gender_fig = create_sas_gender_pie_chart(gender_counts)
             
             # MODIFIED: Create histogram widget to take full width
             sas_histogram = html.Div(className="widget", children=[
@@ -110,7 +116,7 @@ def register_callbacks(app, crime_df, neighbourhoods_df, network_df, buildings_d
 
         # --- Crime Widget ---
         if crime_viz_selection:
-            initial_crime_fig = create_crime_histogram_figure(crime_df) 
+            initial_crime_fig = create_crime_histogram_figure(count_cube(datasets['crime_points'], CRIME_CUBE_COLUMNS).counts([MONTH_AXIS, 'Crime type']))
             all_widgets.append(html.Div(className="widget", children=[
                 html.Div(style={'display': 'flex', 'justifyContent': 'space-between', 'alignItems': 'center'}, children=[
                     dcc.Markdown(id="crime-widget-title", children="#### Crime Statistics"),
@@ -120,10 +126,11 @@ def register_callbacks(app, crime_df, neighbourhoods_df, network_df, buildings_d
 
         # --- Network Widgets ---
         if toggles_dict.get('network'):
+            network_df = datasets['network']
             initial_metric = 'NACH_rivers_risk' if 'NACH_rivers_risk' in network_df.columns else ('NAIN' if 'NAIN' in network_df.columns else None)
-            series = network_df[initial_metric] if initial_metric and not network_df.empty else pd.Series()
-            initial_network_fig = create_network_histogram_figure(series, initial_metric)
-            initial_jenks_fig = create_jenks_histogram_figure(series, initial_metric)
+            quantiles = column_quantiles(network_df, initial_metric) if initial_metric and not network_df.empty else None
+            initial_network_fig = create_network_histogram_figure(quantiles, initial_metric)
+            initial_jenks_fig = create_jenks_histogram_figure(pd.Series(quantiles.values() if quantiles else []), initial_metric)
             
             network_hist = html.Div(className="widget", children=[dcc.Markdown("#### Network Metric (Deciles)"), dcc.Graph(id="network-histogram-chart", figure=initial_network_fig, style={'height': '220px'})])
             jenks_hist = html.Div(className="widget", children=[dcc.Markdown("#### Network Metric (Jenks)"), dcc.Graph(id="jenks-histogram-chart", figure=initial_jenks_fig, style={'height': '220px'})])
@@ -140,6 +147,7 @@ def register_callbacks(app, crime_df, neighbourhoods_df, network_df, buildings_d
             ]))
 
         # --- Flooding Widgets ---            
+            buildings_df = datasets['buildings']
             buildings_at_risk_cards = create_buildings_at_risk_widget(buildings_df)
             all_widgets.append(html.Div(className="widget", children=[
                 dcc.Markdown("#### Buildings at Hazard Summary (Recurrence Interval)"),
@@ -164,6 +172,7 @@ def register_callbacks(app, crime_df, neighbourhoods_df, network_df, buildings_d
 
         # --- Land Use Widget ---
         if toggles_dict.get('land_use'):
+            land_use_df = datasets['land_use']
             initial_land_use_fig = create_land_use_chart(land_use_df, title="Cardiff Land Use")
             initial_high_level_fig = create_high_level_land_use_chart(land_use_df, title="High-Level Land Use")
             
@@ -184,7 +193,7 @@ def register_callbacks(app, crime_df, neighbourhoods_df, network_df, buildings_d
 
         # --- Deprivation Widget ---
         if toggles_dict.get('deprivation'):
-            initial_deprivation_fig = create_deprivation_bar_chart(deprivation_df)
+            initial_deprivation_fig = create_deprivation_bar_chart(datasets['deprivation'].copy())
             all_widgets.append(html.Div(className="widget", children=[
                 dcc.Markdown(id="deprivation-widget-title", children="#### Household Deprivation"), 
                 dcc.Graph(id="deprivation-bar-chart", figure=initial_deprivation_fig, style={'height': '220px'})
@@ -193,7 +202,7 @@ def register_callbacks(app, crime_df, neighbourhoods_df, network_df, buildings_d
         # --- Population Widgets ---
         if toggles_dict.get('population'):
             # MODIFIED: Use the combined population widget
-            population_widget_combined = create_combined_population_widget(population_df)
+            population_widget_combined = create_combined_population_widget(datasets['population'])
             all_widgets.append(population_widget_combined)
 
         return all_widgets if all_widgets else []
@@ -215,7 +224,8 @@ def register_callbacks(app, crime_df, neighbourhoods_df, network_df, buildings_d
     )
     def update_selected_neighbourhood(click_info):
         if click_info and click_info.get('object') and click_info['object'].get('id') == 'neighbourhoods':
-            return click_info['object']['properties']
+            # The clicked feature's properties stay server-side; the store only carries their key
+            return get_session_store().put(click_info['object']['properties'])
         return no_update
 
     @app.callback(
@@ -255,9 +265,10 @@ def register_callbacks(app, crime_df, neighbourhoods_df, network_df, buildings_d
         State('apply-filters-btn', 'n_clicks'),
         prevent_initial_call=True
     )
-    def clear_graph_filters(clear_clicks, month_map, n_clicks):
+    def clear_graph_filters(clear_clicks, month_map_key, n_clicks):
         if not clear_clicks:
             return no_update, no_update, no_update
+        month_map = get_session_store().get(month_map_key)
         slider_reset_value = [0, len(month_map) - 1] if month_map else [0, 0]
         return slider_reset_value, [], (n_clicks or 0) + 1
         
@@ -292,34 +303,32 @@ def register_callbacks(app, crime_df, neighbourhoods_df, network_df, buildings_d
         [Input("selected-neighbourhood-store", "data"), Input("apply-filters-btn", "n_clicks")],
         [State("time-filter-slider", "value"), State("crime-type-filter-dropdown", "value"), State("month-map-store", "data")]
     )
-    def update_crime_widget(selected_neighbourhood, n_clicks, time_range, selected_crime_types, month_map):
+    def update_crime_widget(selected_neighbourhood_key, n_clicks, time_range, selected_crime_types, month_map_key):
+        selected_neighbourhood = get_session_store().get(selected_neighbourhood_key)
+        month_map = get_session_store().get(month_map_key)
         widget_title = "#### Crime Statistics"
         chart_title = "Crimes per Month by Type"
 
-        df_to_filter = crime_df.copy()
+        crime_cube = count_cube(datasets['crime_points'], CRIME_CUBE_COLUMNS)
+        neighbourhoods_df = datasets['neighbourhoods']
+
+        # The chart is summed from a slice of the month x crime type x neighbourhood count cube
+        month_range, filters = slider_month_range(time_range, month_map), {}
+        if selected_crime_types:
+            filters['Crime type'] = selected_crime_types
 
         if selected_neighbourhood:
             name = selected_neighbourhood.get('NAME')
-            if name:
+            # Rows are tagged with their neighbourhood at load (see add_neighbourhood_column);
+            # without the tags the chart stays unfiltered and keeps the unfiltered titles
+            if name and NEIGHBOURHOOD_COLUMN in crime_cube.columns and not neighbourhoods_df[neighbourhoods_df['NAME'] == name].empty:
                 widget_title = f"#### Crime Statistics for {name}"
                 chart_title = f"Crimes in {name}"
-                poly_row = neighbourhoods_df[neighbourhoods_df['NAME'] == name]
-                if not poly_row.empty:
-                    polygon = poly_row.iloc[0]['contour']
-                    mask = df_to_filter.apply(lambda row: is_point_in_polygon((row['Longitude'], row['Latitude']), polygon), axis=1)
-                    df_to_filter = df_to_filter[mask]
-
-        if time_range and month_map:
-            start_month_str, end_month_str = month_map.get(str(time_range[0])), month_map.get(str(time_range[1]))
-            if start_month_str and end_month_str:
-                df_to_filter['Month_dt'] = pd.to_datetime(df_to_filter['Month'], errors='coerce')
-                start_date, end_date = pd.to_datetime(start_month_str), pd.to_datetime(end_month_str)
-                df_to_filter = df_to_filter[(df_to_filter['Month_dt'] >= start_date) & (df_to_filter['Month_dt'] <= end_date)]
+                filters[NEIGHBOURHOOD_COLUMN] = [name]
 
-        if selected_crime_types:
-            df_to_filter = df_to_filter[df_to_filter['Crime type'].isin(selected_crime_types)]
+        monthly_crimes = crime_cube.counts([MONTH_AXIS, 'Crime type'], month_range, filters)
 
-        fig = create_crime_histogram_figure(df_to_filter, title=chart_title) 
+        fig = create_crime_histogram_figure(monthly_crimes, title=chart_title)
         return fig, widget_title
 
     @app.callback(
@@ -331,13 +340,11 @@ def register_callbacks(app, crime_df, neighbourhoods_df, network_df, buildings_d
         if not network_metric or not network_range:
             return no_update, no_update
 
-        df = network_df.copy()
-        df[network_metric] = pd.to_numeric(df[network_metric], errors='coerce')
-        mask = (df[network_metric] >= network_range[0]) & (df[network_metric] <= network_range[1])
-        filtered_series = df.loc[mask, network_metric].dropna()
+        # The range filter is answered from the metric's sorted values, shared with the map's decile colouring
+        quantiles = column_quantiles(datasets['network'], network_metric)
 
-        decile_fig = create_network_histogram_figure(filtered_series, network_metric)
-        jenks_fig = create_jenks_histogram_figure(filtered_series, network_metric)
+        decile_fig = create_network_histogram_figure(quantiles, network_metric, network_range)
+        jenks_fig = create_jenks_histogram_figure(pd.Series(quantiles.values(network_range)), network_metric)
         return decile_fig, jenks_fig
 
     @app.callback(
@@ -349,7 +356,7 @@ def register_callbacks(app, crime_df, neighbourhoods_df, network_df, buildings_d
             return no_update
 
         selected = risk_type if isinstance(risk_type, (list, tuple)) else [risk_type]
-        fig = create_flood_risk_chart(buildings_df, selected, title="")
+        fig = create_flood_risk_chart(datasets['buildings'], selected, title="")
         return fig
 
     @app.callback(
@@ -392,12 +399,17 @@ def register_callbacks(app, crime_df, neighbourhoods_df, network_df, buildings_d
         [Input("selected-neighbourhood-store", "data"), Input("apply-filters-btn", "n_clicks")],
         [State("land-use-type-dropdown", "value")]
     )
-    def update_land_use_widget(selected_neighbourhood, n_clicks, selected_land_use):
+    def update_land_use_widget(selected_neighbourhood_key, n_clicks, selected_land_use):
+        selected_neighbourhood = get_session_store().get(selected_neighbourhood_key)
         widget_title = "#### Land Use (Detailed)"
         high_level_title = "#### Land Use (High-Level)"
         chart_title = "Land Use Distribution"
 
-        df_to_filter = land_use_df.copy()
+        land_use_df = datasets['land_use']
+        neighbourhoods_df = datasets['neighbourhoods']
+
+        # The land use type and neighbourhood filters select a row bitmap over the registry frame (see utils/filter_engine.py)
+        filters = {'landuse_text': selected_land_use or None}
 
         if selected_neighbourhood:
             name = selected_neighbourhood.get('NAME')
@@ -405,19 +417,10 @@ def register_callbacks(app, crime_df, neighbourhoods_df, network_df, buildings_d
                 widget_title = f"#### Land Use (Detailed) for {name}"
                 high_level_title = f"#### Land Use (High-Level) for {name}"
                 chart_title = f"Land Use in {name}"
-                poly_row = neighbourhoods_df[neighbourhoods_df['NAME'] == name]
-                if not poly_row.empty:
-                    neighbourhood_polygon = Polygon(poly_row.iloc[0]['contour'])
-
-                    def is_land_use_in_neighbourhood(row):
-                        land_use_poly = Polygon(row['contour'])
-                        return neighbourhood_polygon.contains(land_use_poly.representative_point())
-
-                    mask = df_to_filter.apply(is_land_use_in_neighbourhood, axis=1)
-                    df_to_filter = df_to_filter[mask]
-
-        if selected_land_use:
-            df_to_filter = df_to_filter[df_to_filter['landuse_text'].isin(selected_land_use)]
+                if not neighbourhoods_df[neighbourhoods_df['NAME'] == name].empty:
+                    filters[NEIGHBOURHOOD_COLUMN] = [name]
+        land_use_rows = filter_rows(datasets, 'land_use', isin=filters)
+        df_to_filter = (land_use_df if land_use_rows is None else land_use_df.iloc[bitmap_rows(land_use_rows)]).copy()
 
         detailed_fig = create_land_use_chart(df_to_filter, title=chart_title)
         high_level_fig = create_high_level_land_use_chart(df_to_filter, title=chart_title)
@@ -429,34 +432,31 @@ def register_callbacks(app, crime_df, neighbourhoods_df, network_df, buildings_d
         [Input("selected-neighbourhood-store", "data"), Input("apply-filters-btn", "n_clicks")],
         [State("deprivation-category-dropdown", "value")]
     )
-    def update_deprivation_widget(selected_neighbourhood, n_clicks, deprivation_category):
+    def update_deprivation_widget(selected_neighbourhood_key, n_clicks, deprivation_category):
+        selected_neighbourhood = get_session_store().get(selected_neighbourhood_key)
         widget_title = "#### Households Deprivation"
         chart_title = "Households by Deprivation Percentile"
-        filtered_df = deprivation_df.copy()
+        deprivation_df = datasets['deprivation']
+        neighbourhoods_df = datasets['neighbourhoods']
+        filters = {}
 
         if selected_neighbourhood:
             name = selected_neighbourhood.get('NAME')
             if name:
                 widget_title = f"#### Deprivation for {name}"
-                poly_row = neighbourhoods_df[neighbourhoods_df['NAME'] == name]
-                if not poly_row.empty:
-                    neighbourhood_polygon = Polygon(poly_row.iloc[0]['contour'])
-
-                    def is_in_neighbourhood(row):
-                        dep_poly = Polygon(row['contour'])
-                        return neighbourhood_polygon.contains(dep_poly.representative_point())
-
-                    mask = filtered_df.apply(is_in_neighbourhood, axis=1)
-                    filtered_df = filtered_df[mask]
+                if not neighbourhoods_df[neighbourhoods_df['NAME'] == name].empty:
+                    filters[NEIGHBOURHOOD_COLUMN] = [name]
 
         category_col = "Household deprivation (6 categories)"
         if deprivation_category:
             if deprivation_category == '4+':
                 keywords = ['four', 'five', 'six']
-                mask = filtered_df[category_col].str.contains('|'.join(keywords), na=False, case=False)
-                filtered_df = filtered_df[mask]
+                filters[category_col] = category_values(deprivation_df[category_col], lambda categories: categories.str.contains('|'.join(keywords), case=False))
             else:
-                filtered_df = filtered_df[filtered_df[category_col] == deprivation_category]
+                filters[category_col] = [deprivation_category]
 
-        fig = create_deprivation_bar_chart(filtered_df, title=chart_title)
+        # The deprivation filters select a row bitmap over the registry frame (see utils/filter_engine.py)
+        deprivation_rows = filter_rows(datasets, 'deprivation', isin=filters)
+        filtered_df = deprivation_df if deprivation_rows is None else deprivation_df.iloc[bitmap_rows(deprivation_rows)]
+        fig = create_deprivation_bar_chart(filtered_df.copy(), title=chart_title)
         return fig, widget_title
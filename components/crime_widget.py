@@ -1,26 +1,18 @@
 # components/crime_widget.py
 import plotly.express as px
-import pandas as pd
 from config import CRIME_COLOR_MAP # Import the crime color map
 
 # The 'color_map' argument has been removed from the function signature
-def create_crime_histogram_figure(crime_df, title="Crimes per Month by Type"):
+def create_crime_histogram_figure(monthly_crimes, title="Crimes per Month by Type"):
     """
-    Creates a stacked bar chart figure of crimes per month, broken down by crime type.
+    Creates a stacked bar chart figure of crimes per month, broken down by crime type,
+    from a frame of counts with 'Month', 'Crime type' and 'count' columns (see CountCube.counts).
     """
-    if crime_df.empty:
+    if monthly_crimes.empty:
         fig = px.bar(title="No crime data for this selection")
     else:
         # Handle null values in 'Crime type' by setting them to 'None'
-        crime_df['Crime type'] = crime_df['Crime type'].fillna('None')
-        
-        # Ensure 'Month' column exists
-        if 'Month' not in crime_df.columns:
-            # Note: Assuming 'Date' column exists and is used to derive 'Month'
-            crime_df['Month_dt'] = pd.to_datetime(crime_df['Date'], errors='coerce')
-            crime_df['Month'] = crime_df['Month_dt'].dt.to_period('M').astype(str)
-
-        monthly_crimes = crime_df.groupby(['Month', 'Crime type']).size().reset_index(name='count')
+        monthly_crimes = monthly_crimes.fillna({'Crime type': 'None'})
         monthly_crimes = monthly_crimes.sort_values('Month')
         
         # Build color map, prioritizing the imported CRIME_COLOR_MAP but allowing for defaults
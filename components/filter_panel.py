@@ -4,19 +4,26 @@ from dash import dcc, html
 import pandas as pd
 from config import NETWORK_METRICS_EXCLUDE, FLOOD_LAYER_CONFIG, BUILDING_COLOR_CONFIG
 
-def create_filter_panel(crime_df, network_df, deprivation_df, buildings_df, land_use_df, neighbourhoods_df, stop_and_search_df):
+def _month_marks(months):
+    return {0: pd.Timestamp(months[0]).strftime('%b %Y'), len(months) - 1: pd.Timestamp(months[-1]).strftime('%b %Y')} if months else {}
+
+def _has_rows(summary):
+    return bool(summary) and summary.get('rows', 0) > 0
+
+def create_filter_panel(crime_summary, network_summary, deprivation_summary, buildings_summary, land_use_summary, neighbourhoods_summary, stop_and_search_summary):
     """
     Creates the slide-down filter panel with controls grouped into styled boxes.
-    Handles None or empty dataframes gracefully.
+    Options come from dataset summaries (see utils.dataset_registry.summarise_dataframe),
+    so layers that have not been loaded yet still get their filters.
+    Handles None or empty summaries gracefully.
     """
     
     # --- Crime Data Components ---
-    if crime_df is not None and not crime_df.empty and 'Month' in crime_df.columns:
-        crime_df['Month_dt'] = pd.to_datetime(crime_df['Month'], format='%Y-%m', errors='coerce')
-        unique_crime_months = sorted(crime_df['Month_dt'].dropna().unique())
-        crime_month_map = {i: month.strftime('%Y-%m') for i, month in enumerate(unique_crime_months)}
-        crime_time_marks = {0: unique_crime_months[0].strftime('%b %Y'), len(unique_crime_months) - 1: unique_crime_months[-1].strftime('%b %Y')} if unique_crime_months else {}
-        all_crime_types = sorted(crime_df['Crime type'].dropna().unique()) if 'Crime type' in crime_df.columns else []
+    if _has_rows(crime_summary) and 'Month' in crime_summary['columns']:
+        unique_crime_months = crime_summary['months']
+        crime_month_map = {i: month for i, month in enumerate(unique_crime_months)}
+        crime_time_marks = _month_marks(unique_crime_months)
+        all_crime_types = crime_summary['values'].get('Crime type', [])
     else:
         unique_crime_months = []
         crime_month_map = {}
@@ -43,12 +50,11 @@ def create_filter_panel(crime_df, network_df, deprivation_df, buildings_df, land
     )
     
     # --- Stop & Search Data Components ---
-    if stop_and_search_df is not None and not stop_and_search_df.empty and 'Date' in stop_and_search_df.columns:
-        stop_and_search_df['Month_dt'] = pd.to_datetime(stop_and_search_df['Date'], errors='coerce').dt.to_period('M').dt.to_timestamp()
-        unique_sas_months = sorted(stop_and_search_df['Month_dt'].dropna().unique())
-        sas_month_map = {i: month.strftime('%Y-%m') for i, month in enumerate(unique_sas_months)}
-        sas_time_marks = {0: unique_sas_months[0].strftime('%b %Y'), len(unique_sas_months) - 1: unique_sas_months[-1].strftime('%b %Y')} if unique_sas_months else {}
-        all_sas_objects = sorted(stop_and_search_df['Object of search'].dropna().unique()) if 'Object of search' in stop_and_search_df.columns else []
+    if _has_rows(stop_and_search_summary) and 'Date' in stop_and_search_summary['columns']:
+        unique_sas_months = stop_and_search_summary['months']
+        sas_month_map = {i: month for i, month in enumerate(unique_sas_months)}
+        sas_time_marks = _month_marks(unique_sas_months)
+        all_sas_objects = stop_and_search_summary['values'].get('Object of search', [])
     else:
         unique_sas_months = []
         sas_month_map = {}
@@ -74,9 +80,8 @@ def create_filter_panel(crime_df, network_df, deprivation_df, buildings_df, land
         placeholder="Filter by Object of Search"
     )
 
-    if network_df is not None and not network_df.empty:
-        numeric_cols = network_df.select_dtypes(include='number').columns.tolist()
-        network_metrics = sorted([col for col in numeric_cols if col not in NETWORK_METRICS_EXCLUDE])
+    if _has_rows(network_summary):
+        network_metrics = sorted([col for col in network_summary['numeric_columns'] if col not in NETWORK_METRICS_EXCLUDE])
     else:
         network_metrics = []
     
@@ -125,8 +130,8 @@ def create_filter_panel(crime_df, network_df, deprivation_df, buildings_df, land
     )
 
     # --- Land Use Components ---
-    if land_use_df is not None and not land_use_df.empty and 'landuse_text' in land_use_df.columns:
-        all_land_use_types = sorted(land_use_df['landuse_text'].dropna().unique())
+    if _has_rows(land_use_summary) and 'landuse_text' in land_use_summary['values']:
+        all_land_use_types = land_use_summary['values']['landuse_text']
     else:
         all_land_use_types = []
     
@@ -157,8 +162,8 @@ def create_filter_panel(crime_df, network_df, deprivation_df, buildings_df, land
     )
     
     # --- Neighbourhood Components ---
-    if neighbourhoods_df is not None and not neighbourhoods_df.empty and 'NAME' in neighbourhoods_df.columns:
-        all_neighbourhoods = sorted(neighbourhoods_df['NAME'].dropna().unique())
+    if _has_rows(neighbourhoods_summary) and 'NAME' in neighbourhoods_summary['values']:
+        all_neighbourhoods = neighbourhoods_summary['values']['NAME']
     else:
         all_neighbourhoods = []
     
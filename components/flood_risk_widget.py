@@ -3,6 +3,7 @@ import plotly.graph_objects as go
 import pandas as pd
 from plotly.subplots import make_subplots
 from config import BUILDING_COLOR_CONFIG
+from utils.categoricals import fill_missing_category, observed_counts
 
 def create_flood_risk_chart(df, hazard_column, title="Flood Hazard Distribution"):
     """
@@ -52,7 +53,7 @@ def create_flood_risk_chart(df, hazard_column, title="Flood Hazard Distribution"
     # -------------------------------------------------------------
     for hazard in hazard_list:
         if hazard in valid_hazards:
-            raw_counts = df[hazard].fillna('Not at hazard').value_counts().reset_index()
+            raw_counts = observed_counts(fill_missing_category(df[hazard], 'Not at hazard')).reset_index()
             raw_counts.columns = ['level', 'count']
             raw_counts['level'] = raw_counts['level'].astype(str).str.strip().str.capitalize()
             
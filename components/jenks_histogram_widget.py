@@ -1,7 +1,7 @@
 # components/jenks_histogram_widget.py
 import plotly.graph_objects as go
 import pandas as pd
-import jenkspy
+from utils.jenks import natural_breaks
 
 def create_jenks_histogram_figure(data_series, metric_name, num_breaks=3):
     """
@@ -26,7 +26,7 @@ def create_jenks_histogram_figure(data_series, metric_name, num_breaks=3):
     actual_num_breaks = min(num_breaks, unique_values_count)
 
     # Calculate Jenks breaks
-    breaks = jenkspy.jenks_breaks(data_series, n_classes=actual_num_breaks)
+    breaks, gvf = natural_breaks(data_series, actual_num_breaks)
     
     # --- FIX: Ensure break points are unique before creating labels ---
     unique_breaks = sorted(list(set(breaks)))
@@ -56,6 +56,8 @@ def create_jenks_histogram_figure(data_series, metric_name, num_breaks=3):
     ))
 
     fig.update_layout(
+        # How well the classes fit the data: 1 - within-class / total variance
+        title=dict(text=f"Goodness of variance fit: {gvf:.2f}", font=dict(size=12)),
         xaxis_title=f"Value of {metric_name}",
         yaxis_title="Number of Road Segments",
         paper_bgcolor="rgba(0,0,0,0)",
@@ -3,6 +3,8 @@ import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
 import textwrap
+from utils.categoricals import observed_counts
+from utils.colours import column_colours
 
 # --- SPACING CONTROLS ---
 # 1. Increased space for the detailed land use legend
@@ -28,16 +30,15 @@ def create_land_use_chart(land_use_df, title=""):
     color_map = {}
     
     # 1. Add all actual categories from the original data to the map
-    for _, row in color_df.iterrows():
-        # Ensure the color is treated as a list of integers before formatting
-        color_rgba = row['color'] if isinstance(row['color'], list) else other_color_rgba
-        color_map[row['landuse_text']] = f'rgba({color_rgba[0]},{color_rgba[1]},{color_rgba[2]},{color_rgba[3]/255})'
+    # (the frame stores each colour packed into one integer, see utils/colours.py)
+    for landuse_text, color_rgba in zip(color_df['landuse_text'], column_colours(color_df['color'].to_numpy()).tolist()):
+        color_map[landuse_text] = f'rgba({color_rgba[0]},{color_rgba[1]},{color_rgba[2]},{color_rgba[3]/255})'
 
     color_map['Other'] = f'rgba({other_color_rgba[0]},{other_color_rgba[1]},{other_color_rgba[2]},{other_color_rgba[3]/255})'
     # --- END EXHAUSTIVE COLOR MAP CREATION ---
 
     # Data processing logic (aggregation for charting)
-    land_use_counts = land_use_df['landuse_text'].value_counts().reset_index()
+    land_use_counts = observed_counts(land_use_df['landuse_text']).reset_index()
     land_use_counts.columns = ['landuse_text', 'count']
     total_count = land_use_counts['count'].sum()
     land_use_counts['percentage'] = (land_use_counts['count'] / total_count) * 100 if total_count > 0 else 0
@@ -99,7 +100,7 @@ def create_high_level_land_use_chart(land_use_df, title=""):
         return fig
 
     # Data processing logic (aggregation for charting)
-    high_level_counts = land_use_df['high_level_landuse'].value_counts().reset_index()
+    high_level_counts = observed_counts(land_use_df['high_level_landuse']).reset_index()
     high_level_counts.columns = ['high_level_landuse', 'count']
     total_count = high_level_counts['count'].sum()
     high_level_counts['percentage'] = (high_level_counts['count'] / total_count) * 100 if total_count > 0 else 0
@@ -2,7 +2,6 @@
 import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
-import pandas as pd
 from config import FLOOD_HAZARD_COLORS 
 
 # --- NEW UTILITY FUNCTION: Generates a color gradient ---
@@ -34,13 +33,14 @@ def get_color_gradient(base_rgb, steps, output_hex=True, light_mix=0.1):
 # --------------------------------------------------------
 
 
-def create_network_histogram_figure(metric_series, metric_name):
+def create_network_histogram_figure(metric_quantiles, metric_name, value_range=None):
     """
     Creates a histogram with 100 bins, colored by 10 decile breaks,
     to show data density. Clicking a bin filters by its decile.
     Color scale changes based on the metric name.
+    Both are read from the metric's ColumnQuantiles, over the values within value_range.
     """
-    if metric_series is None or metric_series.empty or metric_name is None:
+    if metric_quantiles is None or metric_name is None or not len(metric_quantiles.values(value_range)):
         fig = go.Figure()
         fig.update_layout(
             title="No data to display",
@@ -56,12 +56,12 @@ def create_network_histogram_figure(metric_series, metric_name):
     else:
         try:
             # 1. Calculate the 10 decile breaks for coloring and filtering
-            _, decile_edges = pd.qcut(metric_series, 10, labels=False, retbins=True, duplicates='drop')
+            decile_edges = metric_quantiles.decile_edges(value_range)
             num_deciles = len(decile_edges) - 1
 
             # 2. Create 100 bins for the visual representation
             num_fine_bins = 100
-            counts, bin_edges_fine = np.histogram(metric_series, bins=num_fine_bins)
+            counts, bin_edges_fine = metric_quantiles.histogram(num_fine_bins, value_range)
             bar_centers = (bin_edges_fine[:-1] + bin_edges_fine[1:]) / 2
             bar_widths = np.diff(bin_edges_fine)
             
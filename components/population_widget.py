@@ -1,7 +1,7 @@
 # components/population_widget.py
 import plotly.graph_objects as go
 import pandas as pd
-import jenkspy
+from utils.jenks import natural_breaks
 # ADDED: Import html and dcc for combining widgets
 from dash import html, dcc 
 
@@ -45,7 +45,7 @@ def create_population_density_histogram(population_df, num_breaks=5):
 
     # FIXED: Use 10 breaks
     actual_num_breaks = min(10, unique_values_count)
-    breaks = jenkspy.jenks_breaks(data_series, n_classes=actual_num_breaks)
+    breaks, gvf = natural_breaks(data_series, actual_num_breaks)
     unique_breaks = sorted(list(set(breaks)))
     
     # Create labels for the bins
@@ -81,6 +81,7 @@ def create_population_density_histogram(population_df, num_breaks=5):
     ))
 
     fig.update_layout(
+        title=dict(text=f"Goodness of variance fit: {gvf:.2f}", font=dict(size=12)),
         xaxis_title="Population Density (Area x Residents)",
         yaxis_title="Number of Areas (OA)",
         paper_bgcolor="rgba(0,0,0,0)",
@@ -1,12 +1,12 @@
 # components/sas_gender_widget.py
 import plotly.graph_objects as go
-import pandas as pd
 
-def create_sas_gender_pie_chart(df):
+def create_sas_gender_pie_chart(gender_counts):
     """
-    Creates a pie chart for the gender distribution within the Stop & Search data.
+    Creates a pie chart for the gender distribution within the Stop & Search data,
+    from a frame of counts with 'Gender' and 'count' columns (see CountCube.counts).
     """
-    if df.empty or 'Gender' not in df.columns:
+    if gender_counts.empty:
         fig = go.Figure()
         fig.update_layout(
             title="No gender data available",
@@ -16,7 +16,8 @@ def create_sas_gender_pie_chart(df):
         return fig
 
     # Filter for only 'Male' and 'Female' and count them
-    gender_counts = df[df['Gender'].isin(['Male', 'Female'])]['Gender'].value_counts()
+    gender_counts = gender_counts[gender_counts['Gender'].isin(['Male', 'Female'])]
+    gender_counts = gender_counts.set_index('Gender')['count'].sort_values(ascending=False, kind='stable')
     
     # Define colors
     colors = {'Male': '#1f77b4', 'Female': '#e377c2'}
@@ -1,16 +1,16 @@
 # components/stop_and_search_widget.py
 import plotly.express as px
-import pandas as pd
 from config import STOP_AND_SEARCH_COLOR_MAP # Import the map from config
 
 # The local color map definition has been removed.
 
-def create_stop_and_search_histogram_figure(df, title=""):
+def create_stop_and_search_histogram_figure(monthly_events, title=""):
     """
     Creates a stacked bar chart of stop and search events per month,
-    broken down by the object of the search, with distinct colors for each category.
+    broken down by the object of the search, with distinct colors for each category,
+    from a frame of counts with 'Month', 'Object of search' and 'count' columns (see CountCube.counts).
     """
-    if df.empty or 'Object of search' not in df.columns:
+    if monthly_events.empty:
         fig = px.bar(title="No Stop & Search data for this selection")
         fig.update_layout(
             paper_bgcolor="rgba(0,0,0,0)",
@@ -19,14 +19,7 @@ def create_stop_and_search_histogram_figure(df, title=""):
         return fig
     
     # Handle null values in 'Object of search' by setting them to 'None'
-    df['Object of search'] = df['Object of search'].fillna('None')
-
-    # Ensure 'Month' column exists from the datetime
-    df['Month_dt'] = pd.to_datetime(df['Date'], errors='coerce')
-    df['Month'] = df['Month_dt'].dt.to_period('M').astype(str)
-
-    # Group by both month and object of search to create stacks
-    monthly_events = df.groupby(['Month', 'Object of search']).size().reset_index(name='count')
+    monthly_events = monthly_events.fillna({'Object of search': 'None'})
     monthly_events = monthly_events.sort_values('Month')
 
     # Get unique search objects and create a complete color map
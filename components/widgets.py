@@ -1,6 +1,9 @@
 # components/widgets.py
 from dash import dcc, html
 import pandas as pd
+from config import CRIME_CUBE_COLUMNS
+from utils.count_cube import count_cube, MONTH_AXIS
+from utils.quantiles import column_quantiles
 from .crime_widget import create_crime_histogram_figure
 from .network_widget import create_network_histogram_figure
 from .flood_risk_widget import create_flood_risk_chart
@@ -19,13 +22,14 @@ def get_widgets(dataframes, color_map):
     land_use_df = dataframes.get('land_use', pd.DataFrame())
     deprivation_df = dataframes.get('deprivation', pd.DataFrame())
     
-    initial_crime_fig = create_crime_histogram_figure(crime_df, color_map)
+    crime_counts = count_cube(crime_df, CRIME_CUBE_COLUMNS).counts([MONTH_AXIS, 'Crime type']) if not crime_df.empty else pd.DataFrame()
+    initial_crime_fig = create_crime_histogram_figure(crime_counts)
     
     # MODIFIED: Changed default metric to 'NACH_rivers_risk' with a fallback to 'NAIN'
     initial_metric = 'NACH_rivers_risk' if 'NACH_rivers_risk' in network_df.columns else ('NAIN' if 'NAIN' in network_df.columns else None)
-    initial_metric_series = network_df[initial_metric] if initial_metric and not network_df.empty else pd.Series()
-    initial_network_fig = create_network_histogram_figure(initial_metric_series, initial_metric)
-    initial_jenks_fig = create_jenks_histogram_figure(initial_metric_series, initial_metric)
+    initial_metric_quantiles = column_quantiles(network_df, initial_metric) if initial_metric and not network_df.empty else None
+    initial_network_fig = create_network_histogram_figure(initial_metric_quantiles, initial_metric)
+    initial_jenks_fig = create_jenks_histogram_figure(pd.Series(initial_metric_quantiles.values() if initial_metric_quantiles else []), initial_metric)
 
     initial_flood_risk_fig = create_flood_risk_chart(buildings_df, 'Sea_risk', title="")
     
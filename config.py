@@ -183,6 +183,66 @@ CRIME_COLOR_MAP = {
 # Columns to exclude from the dynamic network filter
 NETWORK_METRICS_EXCLUDE = ['fid', 'X1', 'Y1', 'X2', 'Y2', 'Depthmap_Ref']
 
+# --- Data loading ---
+# GeoJSON files at least this large are parsed feature by feature instead of with json.load
+GEOJSON_STREAMING_MIN_BYTES = 50 * 1024 * 1024
+# Number of features converted into a DataFrame chunk at a time when streaming
+GEOJSON_STREAMING_BATCH_SIZE = 5000
+# Size of each text read from disk when streaming
+GEOJSON_STREAMING_CHUNK_BYTES = 1024 * 1024
+
+# Prepared datasets (Parquet + geometry buffers) are cached here, keyed by a hash of the source file
+DATA_CACHE_DIR = "cache"
+DATA_CACHE_ENABLED = True
+# Bump whenever the loader or the derived-column logic changes, to invalidate every cache entry
+DATA_LOADER_VERSION = 8
+# Memory-map the cached geometry buffers read-only instead of reading them into memory, so every
+# worker process of a deployment (see gunicorn.conf.py) shares one copy through the page cache
+GEOMETRY_MMAP = False
+# Low-cardinality text columns stored as pandas Categoricals, so filters and counts work on integer codes
+CATEGORICAL_COLUMNS = [
+    'Crime type', 'Object of search', 'landuse_text', 'high_level_landuse', 'Household deprivation (6 categories)',
+    'hazard_level', 'river_hazard', 'sea_hazard', 'surface_hazard'
+]
+# Rows of these layers are tagged at load time with the NAME of the "neighbourhoods" feature containing
+# them (their point, or a point inside their polygon), in a categorical NEIGHBOURHOOD_COLUMN
+NEIGHBOURHOOD_LAYERS = ['crime_points', 'crime_heatmap', 'stop_and_search', 'buildings', 'land_use', 'population', 'deprivation']
+NEIGHBOURHOOD_COLUMN = 'neighbourhood'
+# Columns behind the multi-select and neighbourhood filters, indexed at load time with one packed row bitmap per value
+BITMAP_INDEX_COLUMNS = ['Crime type', 'Object of search', 'landuse_text', 'NAME', 'Household deprivation (6 categories)', NEIGHBOURHOOD_COLUMN]
+# Every numeric column of these layers gets a sorted copy at load time, from which the metric range
+# filter's deciles and histograms are read (see utils/quantiles.py)
+QUANTILE_INDEX_LAYERS = ['network']
+# Column sets of the month x category count cubes behind the crime and stop & search charts, by layer,
+# built at load time over the columns of the set the layer's frame has (it has no neighbourhood column
+# when the neighbourhoods layer is not available)
+CRIME_CUBE_COLUMNS = ['Crime type', NEIGHBOURHOOD_COLUMN]
+SAS_CUBE_COLUMNS = ['Object of search', 'Gender', NEIGHBOURHOOD_COLUMN]
+COUNT_CUBE_COLUMNS = {'crime_points': CRIME_CUBE_COLUMNS, 'stop_and_search': SAS_CUBE_COLUMNS}
+# Number of datasets loaded concurrently at startup (1 loads them one after another)
+DATA_LOAD_WORKERS = 4
+# Only layers with "visible": True are loaded at startup; the rest are loaded the first time they are switched on
+DATA_LAZY_LOADING = True
+
+# --- Map payload ---
+# Send layer positions, colours and numeric columns to the browser as base64 typed-array
+# buffers (expanded by decodeDeckPayload in assets/scripts.js) instead of JSON row records
+DECK_BINARY_TRANSPORT = True
+# Memory budget for serialised layer data reused across map updates whose layer filters did not change
+LAYER_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Jenks natural breaks (jenkspy, O(k * n^2)) are computed exactly up to this many values, and on that
+# many evenly spaced order statistics above it; results are memoised within this memory budget
+JENKS_EXACT_MAX_VALUES = 5000
+JENKS_CACHE_MAX_BYTES = 1024 * 1024
+# Memory budget for the row bitmaps of filters shared by the map and widget callbacks (see utils/filter_engine.py)
+FILTER_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Server-side store of callback state (map update trigger, month maps, clicked neighbourhood), of which
+# the browser's dcc.Store components hold only a key: 'memory' (per process) or 'sqlite' (shared by
+# every worker process through SESSION_STORE_PATH)
+SESSION_STORE_BACKEND = 'memory'
+SESSION_STORE_PATH = DATA_CACHE_DIR + "/sessions.sqlite"
+SESSION_STORE_MAX_BYTES = 64 * 1024 * 1024
+
 # Initial map view settings
 INITIAL_VIEW_STATE_CONFIG = { "latitude": 51.4950, "longitude": -3.20, "zoom": 11.5, "pitch": 45, "bearing": 0 }
 
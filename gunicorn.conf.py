@@ -0,0 +1,46 @@
+# gunicorn.conf.py
+#
+# Production serving: gunicorn -c gunicorn.conf.py
+#
+# The app (and with it every dataset, its indexes, count cubes and quantile
+# sketches) is loaded once in the master process, which then forks the
+# workers. The loaded data is never modified, so the workers share its memory
+# pages copy-on-write with the master, and each extra worker costs little more
+# than its own interpreter and caches. Geometry buffers are memory-mapped
+# read-only from the data cache, so they are shared through the page cache.
+import gc
+import multiprocessing
+import os
+
+# Not imported as `config`, which gunicorn would read as its own setting of that name
+import config as app_config
+
+# Settings that only make sense with several worker processes, applied before the app is imported
+app_config.DATA_LAZY_LOADING = False      # load every dataset before forking, not once per worker
+app_config.GEOMETRY_MMAP = True
+app_config.SESSION_STORE_BACKEND = 'sqlite'  # callback state keys must resolve in whichever worker serves the next request
+
+wsgi_app = "app:server"
+preload_app = True
+bind = os.environ.get("BIND", "0.0.0.0:8050")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+# The first map update of a session can take a while on the full datasets
+timeout = 120
+
+# The cyclic garbage collector writes to the header of every object it scans,
+# which would copy the shared pages into each worker; objects created while
+# loading are frozen out of its reach before forking
+gc.disable()
+
+
+def when_ready(server):
+    server.log.info("Datasets loaded; forking %s workers", workers)
+
+
+def pre_fork(server, worker):
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
@@ -0,0 +1,58 @@
+# tests/benchmark_point_in_polygon.py
+#
+# Times points_in_polygon against the original per-point ray-casting loop on
+# the street crime points and the neighbourhood polygons, and checks that both
+# classify every point alike:
+#
+#     python tests/benchmark_point_in_polygon.py [--sample N]
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import LAYER_CONFIG
+from test_geometry import reference_mask
+from utils.dataset_registry import load_data_efficiently, NEIGHBOURHOODS_LAYER
+from utils.geometry import points_in_polygon
+from utils.geometry_store import get_geometry_store, GEOMETRY_ID_COLUMN
+from utils.spatial_index import row_positions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark points_in_polygon against the original ray-casting loop")
+    parser.add_argument('--sample', type=int, default=5000, help="number of points timed with the original loop, which is slow on large samples")
+    args = parser.parse_args()
+
+    points = row_positions(load_data_efficiently(LAYER_CONFIG['crime_points']['file_path']))
+    neighbourhoods = load_data_efficiently(LAYER_CONFIG[NEIGHBOURHOODS_LAYER]['file_path'])
+    store = get_geometry_store(neighbourhoods)
+    polygons = [store.rings(geom_id) for geom_id in neighbourhoods[GEOMETRY_ID_COLUMN]]
+    sample = points[np.random.default_rng(0).choice(len(points), min(args.sample, len(points)), replace=False)]
+    print(f"{len(points)} crime points, {len(polygons)} neighbourhoods, {sum(len(r) for p in polygons for r in p)} vertices")
+
+    loop_time = kernel_time = full_time = 0.0
+    for rings in polygons:
+        start = time.perf_counter()
+        expected = reference_mask(sample, rings)
+        loop_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        mask = points_in_polygon(sample, rings)
+        kernel_time += time.perf_counter() - start
+        if not (mask == expected).all():
+            sys.exit(f"Mismatch on {int((mask != expected).sum())} points")
+
+        start = time.perf_counter()
+        points_in_polygon(points, rings)
+        full_time += time.perf_counter() - start
+
+    print(f"{len(sample)} sampled points: loop {loop_time * 1000:.0f} ms, kernel {kernel_time * 1000:.1f} ms ({loop_time / kernel_time:.0f}x), identical masks")
+    print(f"All {len(points)} points: kernel {full_time * 1000:.1f} ms ({full_time / len(polygons) * 1000:.2f} ms per neighbourhood)")
+
+
+if __name__ == "__main__":
+    main()
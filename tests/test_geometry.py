@@ -0,0 +1,129 @@
+# tests/test_geometry.py
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+
+from utils import geometry
+from utils.geometry import points_in_polygon, is_point_in_polygon
+from utils.spatial_index import polygon_membership
+
+
+def reference_is_point_in_polygon(point, polygon):
+    # The original per-point ray-casting loop over a single ring, kept as the reference
+    lon, lat = point
+    vertices = polygon
+    n = len(vertices)
+    inside = False
+
+    p1_lon, p1_lat = vertices[0]
+    for i in range(n + 1):
+        p2_lon, p2_lat = vertices[i % n]
+        if lat > min(p1_lat, p2_lat):
+            if lat <= max(p1_lat, p2_lat):
+                if lon <= max(p1_lon, p2_lon):
+                    if p1_lat != p2_lat:
+                        xinters = (lat - p1_lat) * (p2_lon - p1_lon) / (p2_lat - p1_lat) + p1_lon
+                    if p1_lon == p2_lon or lon <= xinters:
+                        inside = not inside
+        p1_lon, p1_lat = p2_lon, p2_lat
+
+    return inside
+
+
+def reference_mask(coords, rings):
+    # Even-odd rule over several rings: inside an odd number of them
+    return np.array([sum(reference_is_point_in_polygon(p, ring) for ring in rings) % 2 == 1 for p in coords])
+
+
+SQUARE = [[0.0, 0.0], [4.0, 0.0], [4.0, 4.0], [0.0, 4.0], [0.0, 0.0]]
+HOLE = [[1.0, 1.0], [2.0, 1.0], [2.0, 2.0], [1.0, 2.0], [1.0, 1.0]]
+TRIANGLE = [[6.0, 0.0], [8.0, 0.0], [7.0, 3.0], [6.0, 0.0]]
+
+
+def jagged_ring(seed=0, n=400):
+    rng = np.random.default_rng(seed)
+    t = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    r = 1 + 0.3 * np.sin(7 * t) + 0.05 * rng.standard_normal(n)
+    ring = np.column_stack([r * np.cos(t), r * np.sin(t)]).round(3)
+    return np.vstack([ring, ring[:1]])
+
+
+def boundary_points(ring):
+    # Every vertex and edge midpoint, plus points level with each vertex on either side
+    ring = np.asarray(ring)
+    midpoints = (ring[:-1] + ring[1:]) / 2
+    level = np.concatenate([ring + [-1e-3, 0], ring + [1e-3, 0]])
+    return np.concatenate([ring, midpoints, level])
+
+
+def test_matches_reference_loop_on_random_points():
+    ring = jagged_ring()
+    coords = np.random.default_rng(1).uniform(-1.5, 1.5, (5000, 2))
+    assert (points_in_polygon(coords, ring) == reference_mask(coords, [ring])).all()
+
+
+@pytest.mark.parametrize('ring', [SQUARE, HOLE, TRIANGLE, jagged_ring(2)], ids=['square', 'hole', 'triangle', 'jagged'])
+def test_edges_and_vertices_follow_reference_loop(ring):
+    coords = boundary_points(ring)
+    assert (points_in_polygon(coords, ring) == reference_mask(coords, [ring])).all()
+
+
+def test_square_edges():
+    # The ray-casting rule counts the right and top edges as inside, the left and bottom ones as outside
+    coords = [[4.0, 2.0], [2.0, 4.0], [0.0, 2.0], [2.0, 0.0], [2.0, 2.0], [5.0, 2.0]]
+    assert points_in_polygon(coords, SQUARE).tolist() == [True, True, False, False, True, False]
+
+
+def test_hole_is_outside():
+    coords = np.array([[1.5, 1.5], [3.0, 3.0], [0.5, 1.5], [1.9, 1.1]])
+    expected = [False, True, True, False]
+    assert points_in_polygon(coords, [SQUARE, HOLE]).tolist() == expected
+    assert points_in_polygon(coords, shapely.Polygon(SQUARE, [HOLE])).tolist() == expected
+
+
+def test_hole_edges_follow_reference_loop():
+    coords = np.concatenate([boundary_points(SQUARE), boundary_points(HOLE)])
+    assert (points_in_polygon(coords, [SQUARE, HOLE]) == reference_mask(coords, [SQUARE, HOLE])).all()
+
+
+def test_multipolygon_parts():
+    coords = np.array([[1.5, 1.5], [3.0, 3.0], [7.0, 1.0], [5.0, 1.0], [7.0, 2.9]])
+    expected = [False, True, True, False, True]
+    multipolygon = [[SQUARE, HOLE], [TRIANGLE]]
+    assert points_in_polygon(coords, multipolygon).tolist() == expected
+    assert points_in_polygon(coords, shapely.MultiPolygon([shapely.Polygon(SQUARE, [HOLE]), shapely.Polygon(TRIANGLE)])).tolist() == expected
+
+
+def test_matches_shapely_away_from_boundaries():
+    polygon = shapely.Polygon(jagged_ring(3), [jagged_ring(4, 60) * 0.3])
+    coords = np.random.default_rng(5).uniform(-1.5, 1.5, (5000, 2))
+    coords = coords[shapely.distance(polygon.boundary, shapely.points(coords)) > 1e-9]
+    assert (points_in_polygon(coords, polygon) == shapely.contains_xy(polygon, coords[:, 0], coords[:, 1])).all()
+
+
+def test_bbox_prefilter_and_chunking_do_not_change_results(monkeypatch):
+    ring = jagged_ring(6)
+    coords = np.random.default_rng(7).uniform(-2, 2, (3000, 2))
+    expected = points_in_polygon(coords, ring, bbox=False)
+    assert (points_in_polygon(coords, ring) == expected).all()
+    monkeypatch.setattr(geometry, '_MAX_PAIRS_PER_CHUNK', 7)
+    assert (points_in_polygon(coords, ring) == expected).all()
+
+
+def test_missing_and_empty_inputs():
+    assert points_in_polygon([[np.nan, 2.0], [2.0, np.nan]], SQUARE, bbox=False).tolist() == [False, False]
+    assert points_in_polygon(np.empty((0, 2)), SQUARE).tolist() == []
+    assert points_in_polygon([[1.0, 1.0]], []).tolist() == [False]
+
+
+def test_is_point_in_polygon():
+    assert is_point_in_polygon((3.0, 3.0), SQUARE)
+    assert not is_point_in_polygon((5.0, 3.0), SQUARE)
+    assert not is_point_in_polygon((1.5, 1.5), [SQUARE, HOLE])
+
+
+def test_polygon_membership_prefers_first_polygon():
+    df = pd.DataFrame({'Longitude': [1.5, 3.0, 7.0, 9.0, np.nan], 'Latitude': [1.5, 3.0, 1.0, 9.0, 1.0]})
+    polygons = [shapely.Polygon(SQUARE, [HOLE]), shapely.Polygon(TRIANGLE), shapely.Polygon(SQUARE)]
+    assert polygon_membership(df, polygons).tolist() == [2, 0, 1, -1, -1]
@@ -0,0 +1,73 @@
+# utils/bitmap_index.py
+import numpy as np
+
+from utils.colours import category_codes
+from utils.frame_cache import frame_cache
+
+# --- Packed row bitmaps ---
+# A filter over a frame's rows is held as a NumPy packed bitmap (np.packbits of
+# the boolean mask, one bit per row), so filters combine with bitwise & and |
+# over n / 8 bytes. Bits past the last row are always 0.
+
+def to_bitmap(mask):
+    """Returns the packed bitmap of a boolean mask (a packed bitmap is returned as is)."""
+    mask = np.asarray(mask)
+    return mask if mask.dtype == np.uint8 else np.packbits(mask.astype(bool, copy=False))
+
+
+def intersect(bitmap, other):
+    """ANDs two bitmaps, where None stands for every row."""
+    if bitmap is None:
+        return other
+    return bitmap if other is None else bitmap & other
+
+
+def bitmap_rows(bitmap):
+    """Returns the positions of the rows a bitmap selects."""
+    return np.flatnonzero(np.unpackbits(bitmap))
+
+
+class BitmapIndex:
+    """
+    Inverted index over one column of a frame: for each distinct value, the
+    packed bitmap of the rows holding it. Missing values are not indexed.
+    """
+
+    def __init__(self, df, column):
+        codes, categories = category_codes(df, column)
+        self.length = len(codes)
+        self._positions = {value: k for k, value in enumerate(categories)}
+
+        # Rows grouped by code, so each value's rows are one run of `order`
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(categories) + 1))
+        self._bitmaps = np.zeros((len(categories), (self.length + 7) // 8), dtype=np.uint8)
+        for k in range(len(categories)):
+            bits = np.zeros(self.length, dtype=bool)
+            bits[order[bounds[k]:bounds[k + 1]]] = True
+            self._bitmaps[k] = np.packbits(bits)
+        self._bitmaps.flags.writeable = False
+
+    @property
+    def nbytes(self):
+        return self._bitmaps.nbytes
+
+    def select(self, values):
+        """Returns the bitmap of the rows whose value is one of `values` (an OR of their bitmaps)."""
+        positions = [self._positions[value] for value in values if value in self._positions]
+        if not positions:
+            return np.zeros(self._bitmaps.shape[1], dtype=np.uint8)
+        return np.bitwise_or.reduce(self._bitmaps[positions], axis=0)
+
+
+def bitmap_index(df, column):
+    """
+    Returns the BitmapIndex of `df[column]`, cached per frame and column
+    (see utils/frame_cache.py).
+    """
+    return frame_cache(df, ('bitmap_index', column), lambda: BitmapIndex(df, column))
+
+
+def isin_bitmap(df, column, values):
+    """Returns the bitmap of the rows where `df[column]` is in `values`, like df[column].isin(values)."""
+    return bitmap_index(df, column).select(values)
@@ -0,0 +1,58 @@
+# utils/categoricals.py
+import numpy as np
+import pandas as pd
+from pandas.api.types import infer_dtype
+
+
+def encode_categoricals(df, columns):
+    """
+    Converts the string columns of `df` named in `columns` to pandas
+    Categoricals, so filters and counts work on integer codes over one
+    dictionary of values per column. Frames sliced from `df` (e.g. flood
+    partitions) share the dictionary.
+    """
+    for col in columns:
+        if col in df.columns and df[col].dtype == object and infer_dtype(df[col], skipna=True) == 'string':
+            df[col] = df[col].astype('category')
+    return df
+
+
+def fill_missing_category(series, fill):
+    """Like series.fillna(fill), also for Categoricals that do not have `fill` as a category yet."""
+    if isinstance(series.dtype, pd.CategoricalDtype) and fill not in series.cat.categories:
+        if not series.isna().any():
+            return series
+        series = series.cat.add_categories([fill])
+    return series.fillna(fill)
+
+
+def observed_counts(series):
+    """Returns series.value_counts() without the zero counts of categories no row has."""
+    counts = series.value_counts()
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        counts = counts[counts > 0]
+        counts.index = counts.index.astype(object)
+    return counts
+
+
+def category_mask(series, predicate):
+    """
+    Returns a boolean array selecting the rows where `predicate`, a function
+    of a string Series returning a boolean Series, holds. For a Categorical it
+    is evaluated once per category and mapped through the codes; missing
+    values are never selected.
+    """
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        return predicate(series).fillna(False).to_numpy(dtype=bool)
+    matches = predicate(pd.Series(series.cat.categories)).fillna(False).to_numpy(dtype=bool)
+    # Code -1 (missing) picks the appended False
+    return np.append(matches, False)[series.cat.codes.to_numpy()]
+
+
+def category_values(series, predicate):
+    """Returns the distinct values of `series` for which `predicate` (as for category_mask) holds."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        values = pd.Series(series.cat.categories)
+    else:
+        values = pd.Series(series.dropna().unique())
+    return values[predicate(values).fillna(False).to_numpy(dtype=bool)].tolist()
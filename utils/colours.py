@@ -1,6 +1,10 @@
 # utils/colours.py
+import numpy as np
+import pandas as pd
 import plotly.express as px
 
+from utils.frame_cache import frame_cache
+
 def get_crime_colour_map():
     """
     Defines a consistent colour map for different crime types.
@@ -21,3 +25,88 @@ def get_crime_colour_map():
 
     pydeck_colour_map = {crime: hex_to_rgba(colour) for crime, colour in plotly_colour_map.items()}
     return plotly_colour_map, pydeck_colour_map
+
+
+# --- Vectorised colour assignment ---
+# Colours are looked up in a (K + 1, 4) uint8 table indexed by category or bin
+# codes. Missing values get code -1, which NumPy indexing maps to the table's
+# last row, the default colour.
+
+def _factorize(series):
+    # Categorical columns (see utils/categoricals.py) already hold their codes
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), series.cat.categories
+    return pd.factorize(series, use_na_sentinel=True)
+
+
+def category_codes(df, column):
+    """
+    Returns (codes, categories) for `df[column]`: int32 codes into the
+    categories array, -1 for missing values. Cached per frame and column
+    (see utils/frame_cache.py).
+    """
+    def build():
+        codes, categories = _factorize(df[column])
+        codes = codes.astype(np.int32)
+        codes.flags.writeable = False
+        return codes, categories
+    return frame_cache(df, ('category_codes', column), build)
+
+
+def colour_lut(categories, colour_for, default):
+    """Builds the lookup table for `categories`, with `default` as the final row."""
+    return np.array([colour_for(category) for category in categories] + [default], dtype=np.uint8).reshape(-1, 4)
+
+
+def categorical_colours(df, column, colour_for, default, rows=None, cached=False):
+    """
+    Returns an (N, 4) uint8 array colouring each row of `df` (or only the rows
+    at positions `rows`) by `colour_for(value)` of its `column` value, or
+    `default` where the value is missing. With `cached`, the codes of the
+    immutable `df` are reused across calls (see category_codes).
+    """
+    if cached:
+        codes, categories = category_codes(df, column)
+    else:
+        codes, categories = _factorize(df[column])
+    if rows is not None:
+        codes = codes[rows]
+    return colour_lut(categories, colour_for, default)[codes]
+
+
+def binned_colours(bins, palette, default):
+    """
+    Returns an (N, 4) uint8 array colouring each row by `palette[bin]`, where
+    `bins` holds integer class numbers (NaN or negative for no class).
+    """
+    bins = np.asarray(bins, dtype=np.float64)
+    codes = np.full(len(bins), -1, dtype=np.int64)
+    valid = ~np.isnan(bins) & (bins >= 0)
+    codes[valid] = bins[valid]
+    return np.array(list(palette) + [default], dtype=np.uint8).reshape(-1, 4)[codes]
+
+
+def solid_colours(colour, length):
+    """Returns an (N, 4) uint8 array giving all `length` rows the same colour."""
+    return np.tile(np.asarray(colour, dtype=np.uint8), (length, 1))
+
+
+# --- Stored colour columns ---
+# A frame's 'color' column holds each row's RGBA bytes packed into one uint32,
+# a view of the (N, 4) uint8 array rather than a list per row, so it stays
+# compact in memory and in the data cache. It is unpacked only when the layer
+# is serialised (see utils/deck_payload.py).
+
+def colour_column(colours):
+    """Packs an (N, 4) uint8 colour array into the uint32 column stored in frames."""
+    return np.ascontiguousarray(colours, dtype=np.uint8).view(np.uint32).reshape(-1)
+
+
+def column_colours(values):
+    """Unpacks a column built by colour_column back into an (N, 4) uint8 array."""
+    return np.ascontiguousarray(values, dtype=np.uint32).view(np.uint8).reshape(-1, 4)
+
+
+def is_colour_column(name, values):
+    """Tells whether the column `name` holds packed colours (see colour_column)."""
+    return name == 'color' and getattr(values, 'dtype', None) == np.uint32
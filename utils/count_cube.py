@@ -0,0 +1,105 @@
+# utils/count_cube.py
+import numpy as np
+import pandas as pd
+
+from utils.colours import category_codes
+from utils.frame_cache import frame_cache
+from utils.month_index import MONTH_ORDINAL_COLUMN, MISSING_MONTH, month_ordinal
+
+# Name of the month axis in CountCube.counts() frames
+MONTH_AXIS = 'Month'
+
+
+def month_label(ordinal):
+    """Returns the 'YYYY-MM' string of a month ordinal."""
+    return f"{ordinal // 12:04d}-{ordinal % 12 + 1:02d}"
+
+
+class CountCube:
+    """
+    Dense array of row counts of a frame, with one axis for its month
+    ordinals and one per categorical column, so charts of any month range and
+    value subsets are sums over a slice of the array instead of a groupby over
+    the rows. Each axis ends with a slot for rows missing that value.
+    """
+
+    def __init__(self, df, columns):
+        self.columns = list(columns)
+        ordinals = df[MONTH_ORDINAL_COLUMN].to_numpy()
+        dated = ordinals != MISSING_MONTH
+        self.first_month = int(ordinals[dated].min()) if dated.any() else 0
+        self.month_count = int(ordinals[dated].max()) - self.first_month + 1 if dated.any() else 0
+
+        self.labels = {MONTH_AXIS: [month_label(self.first_month + k) for k in range(self.month_count)] + [None]}
+        flat = np.where(dated, ordinals - self.first_month, self.month_count).astype(np.int64)
+        shape = [self.month_count + 1]
+        for column in self.columns:
+            codes, categories = category_codes(df, column)
+            self.labels[column] = list(categories) + [None]
+            flat = flat * (len(categories) + 1) + np.where(codes < 0, len(categories), codes)
+            shape.append(len(categories) + 1)
+        self._positions = {column: {value: k for k, value in enumerate(self.labels[column][:-1])} for column in self.columns}
+
+        self.cube = np.bincount(flat, minlength=int(np.prod(shape))).reshape(shape)
+        self.cube.flags.writeable = False
+
+    @property
+    def nbytes(self):
+        return self.cube.nbytes
+
+    def _slots(self, month_range, filters):
+        # One array of slot positions per axis
+        if month_range:
+            start = max(month_ordinal(month_range[0]) - self.first_month, 0)
+            stop = min(month_ordinal(month_range[1]) - self.first_month + 1, self.month_count)
+            slots = [np.arange(start, max(start, stop))]
+        else:
+            slots = [np.arange(self.month_count + 1)]
+        for column in self.columns:
+            values = (filters or {}).get(column)
+            if values is None:
+                slots.append(np.arange(len(self.labels[column])))
+            else:
+                positions = self._positions[column]
+                slots.append(np.array([positions[value] for value in values if value in positions], dtype=np.intp))
+        return slots
+
+    def counts(self, by, month_range=None, filters=None):
+        """
+        Returns the number of rows per combination of the `by` axes (MONTH_AXIS
+        or cube columns) as a frame with a 'count' column, like
+        df.groupby(by).size(), over the rows whose month lies in `month_range`,
+        a ('YYYY-MM', 'YYYY-MM') pair (inclusive), and whose value in each
+        column of `filters` is one of the values listed for it, like
+        df[column].isin(values). Rows are ordered by month and category, with
+        missing values as None. Rows without a month are only counted when
+        there is no month range and `by` has no MONTH_AXIS.
+        """
+        axes = [MONTH_AXIS] + self.columns
+        slots = self._slots(month_range, filters)
+        sub = self.cube[np.ix_(*slots)]
+        kept = [axes.index(axis) for axis in by]
+        sub = sub.sum(axis=tuple(k for k in range(len(axes)) if k not in kept)).transpose(np.argsort(np.argsort(kept)))
+        if MONTH_AXIS in by:
+            month = by.index(MONTH_AXIS)
+            undated = slots[0] == self.month_count
+            sub = np.compress(~undated, sub, axis=month)
+            slots[0] = slots[0][~undated]
+
+        cells = np.nonzero(sub)
+        frame = pd.DataFrame({
+            axis: np.array(self.labels[axis], dtype=object)[slots[axes.index(axis)][cells[k]]]
+            for k, axis in enumerate(by)
+        })
+        frame['count'] = sub[cells].astype(np.int64)
+        return frame
+
+
+def count_cube(df, columns):
+    """
+    Returns the CountCube of `df` over those of `columns` it has (check
+    CountCube.columns before filtering or grouping by an optional one),
+    cached per frame and columns (see utils/frame_cache.py).
+    """
+    columns = tuple(column for column in columns if column in df.columns)
+    return frame_cache(df, ('count_cube', columns), lambda: CountCube(df, columns))
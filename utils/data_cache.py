@@ -0,0 +1,191 @@
+# utils/data_cache.py
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import pandas as pd
+from pandas.api.types import infer_dtype
+
+from config import DATA_CACHE_DIR, DATA_CACHE_ENABLED, DATA_LOADER_VERSION, GEOMETRY_MMAP
+from utils.geometry_store import GeometryStore, get_geometry_store, attach_geometry_store
+
+_HASH_CHUNK_BYTES = 4 * 1024 * 1024
+
+
+def file_digest(file_path):
+    """
+    Returns the SHA-256 of a file. The digest is remembered next to the cache
+    together with the file's size and mtime, so unchanged files are not re-read.
+    """
+    stat = os.stat(file_path)
+    memo_dir = os.path.join(DATA_CACHE_DIR, 'digests')
+    memo_path = os.path.join(memo_dir, hashlib.sha1(os.path.abspath(file_path).encode()).hexdigest() + '.json')
+    try:
+        with open(memo_path, 'r') as f:
+            memo = json.load(f)
+        if memo['size'] == stat.st_size and memo['mtime_ns'] == stat.st_mtime_ns:
+            return memo['sha256']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_BYTES), b''):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+
+    os.makedirs(memo_dir, exist_ok=True)
+    _write_json_atomic(memo_path, {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest})
+    return digest
+
+
+def _write_json_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _entry_prefix(file_path):
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    path_hash = hashlib.sha1(os.path.abspath(file_path).encode()).hexdigest()[:8]
+    return f"{stem}-{path_hash}-"
+
+
+def cache_entry_dir(file_path, variant=''):
+    """
+    Returns the cache directory for a source file. The key combines the file's
+    content hash, DATA_LOADER_VERSION and a `variant` describing how the
+    frame was prepared (e.g. which layers read it).
+    """
+    key = hashlib.sha256(f"{file_digest(file_path)}|{DATA_LOADER_VERSION}|{variant}".encode()).hexdigest()[:16]
+    return os.path.join(DATA_CACHE_DIR, _entry_prefix(file_path) + key)
+
+
+# --- Column encoding ---
+# Parquet needs one type per column, but GeoJSON properties loaded as object
+# columns can mix numbers, strings and None. Such columns are stored as JSON
+# text and decoded on read, so a cached frame matches a freshly parsed one.
+
+def _encode_frame(df):
+    encoded = df.copy(deep=False)
+    encoded.attrs = {}
+    json_columns, list_columns = [], []
+    for col in df.columns:
+        series = df[col]
+        if series.dtype != object:
+            continue
+        kind = infer_dtype(series, skipna=True)
+        if kind in ('string', 'empty'):
+            continue
+        non_null = [v for v in series if v is not None]
+        if non_null and all(isinstance(v, list) for v in non_null):
+            list_columns.append(col)
+            continue
+        encoded[col] = [None if v is None else json.dumps(v) for v in series]
+        json_columns.append(col)
+    return encoded, {'json_columns': json_columns, 'list_columns': list_columns}
+
+
+def _decode_frame(df, meta):
+    for col in meta.get('json_columns', []):
+        df[col] = pd.Series([None if v is None else json.loads(v) for v in df[col]], index=df.index, dtype=object)
+    for col in meta.get('list_columns', []):
+        df[col] = pd.Series([None if v is None else v.tolist() for v in df[col]], index=df.index, dtype=object)
+    return df
+
+
+def read_cache_entry(entry_dir):
+    with open(os.path.join(entry_dir, 'meta.json'), 'r') as f:
+        meta = json.load(f)
+    df = _decode_frame(pd.read_parquet(os.path.join(entry_dir, 'frame.parquet')), meta)
+    geometry_dir = os.path.join(entry_dir, 'geometry')
+    if os.path.isdir(geometry_dir):
+        attach_geometry_store(df, GeometryStore.load(geometry_dir, mmap_mode='r' if GEOMETRY_MMAP else None))
+    return df
+
+
+def read_cache_summary(file_path, variant=''):
+    """
+    Returns the summary stored alongside a cache entry, or None if the source
+    has no up-to-date entry. The frame itself is not read.
+    """
+    if not DATA_CACHE_ENABLED or not os.path.exists(file_path):
+        return None
+    try:
+        with open(os.path.join(cache_entry_dir(file_path, variant), 'meta.json'), 'r') as f:
+            return json.load(f).get('summary')
+    except (OSError, ValueError):
+        return None
+
+
+def write_cache_entry(entry_dir, df, source_path, summary=None):
+    """
+    Writes a prepared frame and its geometry store atomically: the entry is
+    built in a temporary directory and renamed into place.
+    """
+    tmp_dir = f"{entry_dir}.{os.getpid()}.{threading.get_ident()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    try:
+        encoded, meta = _encode_frame(df)
+        encoded.to_parquet(os.path.join(tmp_dir, 'frame.parquet'))
+        store = get_geometry_store(df)
+        if store is not None:
+            store.save(os.path.join(tmp_dir, 'geometry'))
+        meta.update({'source': source_path, 'loader_version': DATA_LOADER_VERSION, 'rows': len(df), 'summary': summary})
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        try:
+            os.replace(tmp_dir, entry_dir)
+        except OSError:
+            # Another worker built the same entry first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def _remove_stale_entries(file_path, entry_dir):
+    if not os.path.isdir(DATA_CACHE_DIR):
+        return
+    prefix, keep = _entry_prefix(file_path), os.path.basename(entry_dir)
+    for name in os.listdir(DATA_CACHE_DIR):
+        if name.startswith(prefix) and name != keep and not name.endswith('.tmp'):
+            shutil.rmtree(os.path.join(DATA_CACHE_DIR, name), ignore_errors=True)
+
+
+def load_with_cache(file_path, build, variant='', describe=None):
+    """
+    Returns the prepared frame for `file_path`, reading it from the columnar
+    cache when the source is unchanged, or calling `build(file_path)` and
+    caching the result otherwise. If given, `describe(df)` produces a small
+    JSON-serialisable summary stored with the entry (see read_cache_summary).
+    Entries for older versions of the same source are removed.
+    """
+    if not DATA_CACHE_ENABLED or not os.path.exists(file_path):
+        return build(file_path)
+
+    entry_dir = cache_entry_dir(file_path, variant)
+    if os.path.isdir(entry_dir):
+        try:
+            start_time = time.perf_counter()
+            df = read_cache_entry(entry_dir)
+            print(f"Loaded {file_path} from cache {entry_dir} in {time.perf_counter() - start_time:.2f}s")
+            return df
+        except Exception as e:
+            print(f"Ignoring unreadable cache entry {entry_dir}: {e}")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+
+    df = build(file_path)
+    if df is not None and not df.empty:
+        try:
+            write_cache_entry(entry_dir, df, file_path, describe(df) if describe else None)
+            _remove_stale_entries(file_path, entry_dir)
+            print(f"Cached {file_path} in {entry_dir}")
+        except Exception as e:
+            print(f"Could not cache {file_path}: {e}")
+    return df
@@ -0,0 +1,187 @@
+# utils/data_preparation.py
+
+import pandas as pd
+import numpy as np
+
+from config import LAYER_CONFIG, FLOOD_LAYER_CONFIG, FLOOD_HAZARD_COLORS, NETWORK_METRICS_EXCLUDE, CATEGORICAL_COLUMNS, NEIGHBOURHOOD_COLUMN
+from utils.colours import categorical_colours, binned_colours, solid_colours, colour_column
+from utils.categoricals import encode_categoricals, category_mask
+from utils.month_index import MONTH_ORDINAL_COLUMN, month_ordinals
+from utils.geometry_store import get_geometry_store, GEOMETRY_ID_COLUMN
+from utils.spatial_index import feature_polygon, polygon_membership
+from utils.jenks import natural_breaks
+
+LAND_USE_COLOR_MAP = {'Coastal water': [0, 1, 125, 160], 'Inland Water': [146, 203, 251, 160], 'Deciduous woodland': [92, 142, 63, 160], 'Coniferous and undifferentiated woodland': [1, 103, 0, 160], 'Unimproved grassland': [147, 195, 124, 160], 'Open or heath and moor land': [92, 142, 63, 160], 'Coastal dunes': [211, 209, 116, 160], 'Wetlands': [146, 203, 251, 160], 'Low density residential with amenities (suburbs and small villages / hamlets)': [255, 221, 139, 160], 'Medium density residential with high streets and amenities': [255, 204, 88, 160], 'High density residential with retail and commercial sites': [255, 181, 0, 160], 'Urban centres - mainly commercial/retail with residential pockets': [121, 117, 187, 160], 'Retail': [223, 133, 124, 160], 'Retail parks': [2, 1, 215, 160], 'Industrial areas': [71, 0, 89, 160], 'Business parks': [106, 3, 142, 160], 'Mining and spoil areas': [156, 54, 56, 160], 'Amenity': [181, 213, 142, 160], 'Recreational land': [110, 29, 4, 160], 'Transport': [190, 190, 190, 160], 'Community services': [140, 162, 215, 160], 'Large complex buildings various use (travel/recreation/ retail)': [80, 80, 193, 160], 'Agriculture - mixed use': [172, 212, 99, 160], 'Agriculture - mainly crops': [218, 233, 154, 160], 'Farms': [130, 208, 129, 160], 'Orchards': [255, 234, 77, 160], 'Glasshouses': [97, 218, 175, 160]}
+LAND_USE_DEFAULT_COLOR = [128, 128, 128, 120]
+
+POPULATION_JENKS_COLORS = [[253, 224, 221, 220], [250, 159, 181, 220], [247, 104, 161, 220], [197, 27, 138, 220], [122, 1, 119, 220]]
+POPULATION_NO_DENSITY_COLOR = [200, 200, 200, 120]
+
+# Columns added by the preparers below rather than read from the source data
+DERIVED_COLUMNS = ['color', 'bin', 'Month_dt', MONTH_ORDINAL_COLUMN, NEIGHBOURHOOD_COLUMN]
+
+DEPRIVATION_ZERO_COLOR = [229, 245, 224]
+DEPRIVATION_BLUE_SCALE = [[237, 248, 251], [208, 226, 242], [179, 205, 233], [140, 180, 223], [101, 155, 213], [62, 130, 203], [31, 105, 185], [8, 81, 156], [8, 64, 129], [8, 48, 107]]
+# Classes 0-9 are the percentile deciles, 10 is exactly 0% and 11 is a negative percentile
+DEPRIVATION_PALETTE = [color + [180] for color in DEPRIVATION_BLUE_SCALE] + [DEPRIVATION_ZERO_COLOR + [180], [200, 200, 200, 128]]
+DEPRIVATION_MISSING_COLOR = [128, 128, 128, 180]
+
+
+def _prepare_buildings(df):
+    if 'height' in df.columns:
+        # Convert height to a numeric type and replace missing values with 0 to ensure valid JSON
+        df['height'] = pd.to_numeric(df['height'], errors='coerce').fillna(0).astype(float)
+    return df
+
+
+def _prepare_network(df):
+    numeric_cols = df.select_dtypes(include=np.number).columns
+    for col in numeric_cols:
+        if col not in NETWORK_METRICS_EXCLUDE:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(float)
+    return df
+
+
+def _prepare_land_use(df):
+    if 'landuse_text' in df.columns:
+        df = df[df['landuse_text'] != 'Principle Transport'].copy()
+        df['color'] = colour_column(categorical_colours(df, 'landuse_text', lambda v: LAND_USE_COLOR_MAP.get(v, LAND_USE_DEFAULT_COLOR), LAND_USE_DEFAULT_COLOR))
+    else:
+        df['color'] = colour_column(solid_colours(LAND_USE_DEFAULT_COLOR, len(df)))
+    return df
+
+
+def _prepare_population(df):
+    df['density'] = pd.to_numeric(df['density'], errors='coerce')
+    df_valid_density = df[df['density'].notna() & (df['density'] > 0)].copy()
+    df_no_density = df[~df.index.isin(df_valid_density.index)].copy()
+    if not df_valid_density.empty and df_valid_density['density'].nunique() >= 5:
+        # The fit of the classes is reported by natural_breaks
+        breaks, _ = natural_breaks(df_valid_density['density'], 5)
+        df_valid_density['bin'] = pd.cut(df_valid_density['density'], bins=breaks, labels=False, include_lowest=True)
+        df_valid_density['color'] = colour_column(binned_colours(df_valid_density['bin'], POPULATION_JENKS_COLORS, POPULATION_NO_DENSITY_COLOR))
+    else:
+        df_valid_density['color'] = colour_column(solid_colours(POPULATION_JENKS_COLORS[0], len(df_valid_density)))
+    df_no_density['color'] = colour_column(solid_colours(POPULATION_NO_DENSITY_COLOR, len(df_no_density)))
+    return pd.concat([df_valid_density, df_no_density])
+
+
+def _prepare_deprivation(df):
+    df['Percentile'] = pd.to_numeric(df['Percentile'], errors='coerce')
+    percentile = df['Percentile'].to_numpy(dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        classes = np.where(percentile > 0, np.clip(np.floor(percentile / 10), 0, 9), np.where(percentile == 0, 10, 11))
+    classes[np.isnan(percentile)] = np.nan
+    df['color'] = colour_column(binned_colours(classes, DEPRIVATION_PALETTE, DEPRIVATION_MISSING_COLOR))
+    return df
+
+
+def _prepare_network_outline(df):
+    if 'NAIN' not in df.columns:
+        df['color'] = colour_column(solid_colours([0, 0, 0, 255], len(df)))
+    return df
+
+
+def _add_month_columns(df):
+    """
+    Parses the month of crime ('Month') and stop & search ('Date') records once,
+    so the filter panel does not have to, and sorts the records by month so a
+    time range is a contiguous run of rows (see utils/month_index.py).
+    """
+    if 'Month' in df.columns and 'Month_dt' not in df.columns:
+        df['Month_dt'] = pd.to_datetime(df['Month'], format='%Y-%m', errors='coerce')
+    elif 'Date' in df.columns and 'Month_dt' not in df.columns:
+        df['Month_dt'] = pd.to_datetime(df['Date'], errors='coerce').dt.tz_localize(None).dt.to_period('M').dt.to_timestamp()
+    if 'Month_dt' in df.columns and MONTH_ORDINAL_COLUMN not in df.columns:
+        df[MONTH_ORDINAL_COLUMN] = month_ordinals(df['Month_dt'])
+        df = df.sort_values(MONTH_ORDINAL_COLUMN, kind='stable')
+    return df
+
+
+LAYER_PREPARERS = {
+    'buildings': _prepare_buildings,
+    'network': _prepare_network,
+    'land_use': _prepare_land_use,
+    'population': _prepare_population,
+    'deprivation': _prepare_deprivation,
+    'crime_points': _add_month_columns,
+    'network_outline': _prepare_network_outline,
+    'crime_heatmap': _add_month_columns,
+    'stop_and_search': _add_month_columns,
+}
+
+
+def _flood_colors(df, hazard_type, hazard_level):
+    """
+    Returns the packed colour column (see colour_column) colouring each row
+    by its 'risk' (falling back to the layer's hazard level colour) or all
+    rows by the hazard level colour, or None if the layer should keep its
+    default fill. Alpha is 150 for transparency.
+    """
+    color_map = FLOOD_HAZARD_COLORS.get(hazard_type, {})
+    if 'risk' in df.columns and hazard_type in FLOOD_HAZARD_COLORS:
+        fallback = list(color_map.get(hazard_level, [128, 128, 128, 255]))[:3] + [150]
+        def risk_color(value):
+            risk = str(value).lower().strip()
+            return list(color_map[risk])[:3] + [150] if risk in color_map else fallback
+        return colour_column(categorical_colours(df, 'risk', risk_color, fallback))
+    if hazard_type and hazard_level in color_map:
+        return colour_column(solid_colours(list(color_map[hazard_level])[:3] + [150], len(df)))
+    return None
+
+
+def partition_flood_layers(df, layer_keys):
+    """
+    Splits a flood source shared by several FLOOD_LAYER_CONFIG layers into one
+    frame per hazard level, each with its 'color' column already assigned, so
+    rendering a layer only has to pick its partition. Returns {layer_key: frame}.
+    """
+    partitions = {}
+    for layer_key in [k for k in layer_keys if k in FLOOD_LAYER_CONFIG]:
+        config = FLOOD_LAYER_CONFIG[layer_key]
+        hazard_level, hazard_type = config.get('hazard_level'), config.get('hazard_type')
+        if hazard_level and 'hazard_level' in df.columns:
+            partition = df[category_mask(df['hazard_level'], lambda levels: levels.str.lower() == hazard_level.lower())].copy()
+        else:
+            partition = df.copy()
+        colors = _flood_colors(partition, hazard_type, hazard_level)
+        if colors is not None:
+            partition['color'] = colors
+        partitions[layer_key] = partition
+    return partitions
+
+
+def add_neighbourhood_column(df, neighbourhoods):
+    """
+    Tags each row of `df` with the NAME of the `neighbourhoods` polygon
+    containing its point (or a point inside its polygon) as the categorical
+    NEIGHBOURHOOD_COLUMN, missing outside every neighbourhood.
+    """
+    store = get_geometry_store(neighbourhoods)
+    polygons = [feature_polygon(store, geom_id) for geom_id in neighbourhoods[GEOMETRY_ID_COLUMN]]
+    name_codes, names = pd.factorize(neighbourhoods['NAME'].astype(object))
+    # Membership -1 (outside every neighbourhood) picks the appended -1, a missing value
+    codes = np.append(name_codes, -1)[polygon_membership(df, polygons)]
+    df[NEIGHBOURHOOD_COLUMN] = pd.Categorical.from_codes(codes, categories=names)
+    return df
+
+
+def prepare_dataframe(df, layer_keys, neighbourhoods=None):
+    """
+    Adds the derived columns (colors, Jenks classes, parsed months, numeric
+    coercions) needed by every layer in `layer_keys` that reads this data,
+    tags the rows with their neighbourhood if a `neighbourhoods` frame is
+    given, then stores the CATEGORICAL_COLUMNS as Categoricals.
+    Layers are prepared in LAYER_CONFIG order, as they share one frame.
+    """
+    if df is None or df.empty:
+        return df
+
+    all_configs = {**LAYER_CONFIG, **FLOOD_LAYER_CONFIG}
+    for layer_key in [k for k in all_configs if k in layer_keys]:
+        preparer = LAYER_PREPARERS.get(layer_key)
+        if preparer is not None:
+            df = preparer(df)
+    if neighbourhoods is not None and not neighbourhoods.empty and 'NAME' in neighbourhoods.columns and get_geometry_store(neighbourhoods) is not None:
+        df = add_neighbourhood_column(df, neighbourhoods)
+    return encode_categoricals(df, CATEGORICAL_COLUMNS)
@@ -0,0 +1,216 @@
+# utils/dataset_registry.py
+
+import itertools
+import os
+import threading
+import time
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+
+from config import DATA_LOAD_WORKERS, DATA_CACHE_ENABLED, BITMAP_INDEX_COLUMNS, COUNT_CUBE_COLUMNS, NEIGHBOURHOOD_LAYERS, QUANTILE_INDEX_LAYERS
+from utils.geojson_loader import process_geojson_features
+from utils.geometry_store import geometry_store_from_legacy_columns, get_geometry_store, GEOMETRY_ID_COLUMN
+from utils.data_cache import load_with_cache, read_cache_summary, file_digest
+from utils.data_preparation import prepare_dataframe, partition_flood_layers, DERIVED_COLUMNS
+from utils.bitmap_index import bitmap_index
+from utils.count_cube import count_cube
+from utils.month_index import MONTH_ORDINAL_COLUMN
+from utils.quantiles import column_quantiles
+
+# Columns whose distinct values populate filter dropdowns
+SUMMARY_VALUE_COLUMNS = ['Crime type', 'Object of search', 'landuse_text', 'NAME']
+
+# Layer whose polygons the NEIGHBOURHOOD_LAYERS rows are tagged with
+NEIGHBOURHOODS_LAYER = 'neighbourhoods'
+
+
+def load_data_efficiently(file_path):
+    """
+    Loads data from Parquet if it exists, otherwise falls back to GeoJSON.
+    """
+    parquet_path = file_path.replace('.geojson', '.parquet')
+
+    if os.path.exists(parquet_path):
+        print(f"Loading from fast Parquet file: {parquet_path}")
+        return geometry_store_from_legacy_columns(pd.read_parquet(parquet_path))
+    else:
+        print(f"Loading from GeoJSON file: {file_path}")
+        return process_geojson_features(file_path)
+
+
+def _source_path(file_path):
+    parquet_path = file_path.replace('.geojson', '.parquet')
+    return parquet_path if os.path.exists(parquet_path) else file_path
+
+
+def _cache_source(file_path, layer_keys, neighbourhoods_path=None):
+    variant = ','.join(sorted(layer_keys))
+    if neighbourhoods_path and DATA_CACHE_ENABLED and os.path.exists(_source_path(neighbourhoods_path)):
+        # Rows are tagged with the neighbourhoods, so the entry is only valid for that version of them
+        variant += f"|neighbourhoods={file_digest(_source_path(neighbourhoods_path))}"
+    return _source_path(file_path), variant
+
+
+def load_prepared_data(file_path, layer_keys, neighbourhoods=None):
+    """
+    Loads a source file with the derived columns for `layer_keys` added,
+    reusing the columnar cache when the source has not changed. If given,
+    `neighbourhoods` is the (file path, frame getter) of the polygons the
+    rows are tagged with; the frame is only read if the cache is stale.
+    """
+    neighbourhoods_path, get_neighbourhoods = neighbourhoods or (None, lambda: None)
+    source_path, variant = _cache_source(file_path, layer_keys, neighbourhoods_path)
+    return load_with_cache(
+        source_path,
+        lambda _: prepare_dataframe(load_data_efficiently(file_path), layer_keys, get_neighbourhoods()),
+        variant=variant,
+        describe=summarise_dataframe
+    )
+
+
+def summarise_dataframe(df):
+    """
+    Returns the small, JSON-serialisable description of a prepared frame that
+    the filter panel and settings need: its source columns, numeric ranges,
+    distinct filter values and months. It is cached next to the frame so
+    layers that have not been loaded yet can still be described.
+    """
+    numeric_columns = [col for col in df.select_dtypes(include='number').columns if col != GEOMETRY_ID_COLUMN]
+    numeric_ranges = {}
+    for col in numeric_columns:
+        series = pd.to_numeric(df[col], errors='coerce').dropna()
+        if not series.empty:
+            numeric_ranges[col] = [float(series.min()), float(series.max())]
+
+    months = []
+    if 'Month_dt' in df.columns:
+        months = pd.DatetimeIndex(df['Month_dt'].dropna().unique()).sort_values().strftime('%Y-%m').tolist()
+
+    return {
+        'rows': len(df),
+        'columns': [col for col in df.columns if col not in DERIVED_COLUMNS and col != GEOMETRY_ID_COLUMN],
+        'numeric_columns': numeric_columns,
+        'numeric_ranges': numeric_ranges,
+        'values': {col: sorted(df[col].dropna().unique().tolist()) for col in SUMMARY_VALUE_COLUMNS if col in df.columns},
+        'months': months
+    }
+
+
+def dataframe_nbytes(df):
+    """Returns the memory held by a frame's columns and its geometry store."""
+    if df is None:
+        return 0
+    store = get_geometry_store(df)
+    return int(df.memory_usage(deep=True).sum()) + (store.nbytes if store is not None else 0)
+
+
+class DatasetRegistry(Mapping):
+    """
+    Read-only mapping of layer key (from LAYER_CONFIG / FLOOD_LAYER_CONFIG) to
+    its prepared DataFrame. Layers that share a source file share one frame.
+    A file is loaded the first time one of its layers is read, or up front
+    (and concurrently) through load(). Flood layers, which share a file per
+    hazard type, each get their own pre-coloured hazard level partition.
+    Safe to use from concurrent callbacks.
+    """
+
+    def __init__(self, layer_configs):
+        self._layer_files = {
+            layer_key: config['file_path'] for layer_key, config in layer_configs.items()
+            if 'file_path' in config and config.get('type') != 'toggle_only'
+        }
+        self._layers_by_file = {}
+        for layer_key, file_path in self._layer_files.items():
+            self._layers_by_file.setdefault(file_path, []).append(layer_key)
+        self._frames = {}
+        self._partitions = {}
+        self._summaries = {}
+        self._versions = {}
+        self._load_counter = itertools.count(1)
+        self._file_locks = {file_path: threading.Lock() for file_path in self._layers_by_file}
+
+    def __getitem__(self, layer_key):
+        file_path = self._layer_files[layer_key]
+        if file_path not in self._frames:
+            self._load_file(file_path)
+        return self._partitions.get(layer_key, self._frames[file_path])
+
+    def __contains__(self, layer_key):
+        # Mapping's default would read (and so load) the layer
+        return layer_key in self._layer_files
+
+    def __iter__(self):
+        return iter(self._layer_files)
+
+    def __len__(self):
+        return len(self._layer_files)
+
+    def is_loaded(self, layer_key):
+        return self._layer_files.get(layer_key) in self._frames
+
+    def data_version(self, layer_key):
+        """
+        Returns a number that changes whenever the layer's file is loaded, for
+        keying results derived from its data. Loads the layer if needed.
+        """
+        self[layer_key]
+        return self._versions[self._layer_files[layer_key]]
+
+    def _neighbourhoods_file(self, file_path):
+        # The neighbourhoods file, if this file's rows are tagged with its polygons
+        neighbourhoods_path = self._layer_files.get(NEIGHBOURHOODS_LAYER)
+        if neighbourhoods_path and neighbourhoods_path != file_path and any(k in NEIGHBOURHOOD_LAYERS for k in self._layers_by_file[file_path]):
+            return neighbourhoods_path
+        return None
+
+    def _load_file(self, file_path):
+        with self._file_locks[file_path]:
+            if file_path not in self._frames:
+                start_time = time.perf_counter()
+                neighbourhoods_path = self._neighbourhoods_file(file_path)
+                neighbourhoods = (neighbourhoods_path, lambda: self[NEIGHBOURHOODS_LAYER]) if neighbourhoods_path else None
+                df = load_prepared_data(file_path, self._layers_by_file[file_path], neighbourhoods)
+                df = df if df is not None else pd.DataFrame()
+                self._partitions.update(partition_flood_layers(df, self._layers_by_file[file_path]))
+                for column in [col for col in BITMAP_INDEX_COLUMNS if col in df.columns]:
+                    bitmap_index(df, column)
+                for layer_key in [k for k in self._layers_by_file[file_path] if k in COUNT_CUBE_COLUMNS]:
+                    if MONTH_ORDINAL_COLUMN in df.columns:
+                        count_cube(df, COUNT_CUBE_COLUMNS[layer_key])
+                if any(k in QUANTILE_INDEX_LAYERS for k in self._layers_by_file[file_path]):
+                    for column in df.select_dtypes('number').columns.drop(GEOMETRY_ID_COLUMN, errors='ignore'):
+                        column_quantiles(df, column)
+                print(f"  {file_path}: {len(df)} rows in {time.perf_counter() - start_time:.2f}s, {dataframe_nbytes(df) / 1024 ** 2:.1f} MB")
+                self._versions[file_path] = next(self._load_counter)
+                self._frames[file_path] = df
+            return self._frames[file_path]
+
+    def load(self, layer_keys):
+        """
+        Loads the files behind `layer_keys` that are not loaded yet, concurrently
+        with up to DATA_LOAD_WORKERS threads.
+        """
+        file_paths = [path for path in dict.fromkeys(self._layer_files[k] for k in layer_keys if k in self._layer_files) if path not in self._frames]
+        if not file_paths:
+            return
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, DATA_LOAD_WORKERS)) as executor:
+            frames = list(executor.map(self._load_file, file_paths))
+        total_bytes = sum(dataframe_nbytes(df) for df in frames)
+        print(f"Loaded {len(file_paths)} datasets in {time.perf_counter() - start_time:.2f}s ({total_bytes / 1024 ** 2:.1f} MB in memory)")
+
+    def summary(self, layer_key):
+        """
+        Returns summarise_dataframe() for a layer's data, read from the cache
+        when the file has not been loaded, so describing a layer does not load it.
+        """
+        file_path = self._layer_files[layer_key]
+        if file_path not in self._summaries:
+            summary = None
+            if file_path not in self._frames:
+                summary = read_cache_summary(*_cache_source(file_path, self._layers_by_file[file_path], self._neighbourhoods_file(file_path)))
+            if summary is None:
+                summary = summarise_dataframe(self._load_file(file_path))
+            self._summaries[file_path] = summary
+        return self._summaries[file_path]
@@ -0,0 +1,184 @@
+# utils/deck_payload.py
+
+import base64
+import hashlib
+import json
+import re
+import numpy as np
+import pandas as pd
+
+from config import DECK_BINARY_TRANSPORT
+from utils.colours import column_colours, is_colour_column
+from utils.geometry_store import get_geometry_store, with_geometry_columns, GEOMETRY_ID_COLUMN, POLYGON, POINT, LINE
+
+# Key marking layer data sent as typed-array columns (decoded by decodeDeckPayload in assets/scripts.js)
+BINARY_COLUMNS_KEY = 'binaryColumns'
+
+# Columns the callbacks read back from a clicked object (see widget_callbacks)
+CLICK_COLUMNS = ['id', 'properties']
+
+# Keys of the envelope around each layer's data in map updates. The browser keeps the last
+# data it decoded for every layer, so data it already holds is sent as its hash alone
+LAYER_DATA_HASH_KEY = 'layerDataHash'
+LAYER_DATA_KEY = 'layerData'
+
+
+def tooltip_columns(tooltip):
+    """
+    Returns the column names a deck tooltip template refers to, or None for the
+    default tooltip (True), which lists every column of the hovered row.
+    """
+    if tooltip is True:
+        return None
+    if not tooltip:
+        return []
+    return re.findall(r'\{([^{}]+)\}', tooltip.get('html') or tooltip.get('text') or '')
+
+
+def layer_properties(layer_args, tooltip, selected_columns=()):
+    """
+    Returns the columns a layer's rows must carry: those named by its accessors
+    (geometry, e.g. get_polygon='contour', colour and elevation), by the
+    tooltip template and by the layer's own tooltip column selection, plus
+    CLICK_COLUMNS. None means every column.
+    """
+    tooltip_names = tooltip_columns(tooltip)
+    if tooltip_names is None:
+        return None
+    names = [
+        name for key, value in layer_args.items() if key.startswith('get_') and isinstance(value, str)
+        for name in re.findall(r'[A-Za-z_]\w*', value)
+    ]
+    return list(dict.fromkeys(names + tooltip_names + list(selected_columns) + CLICK_COLUMNS))
+
+
+def _take(values, rows):
+    values = values.to_numpy() if isinstance(values, pd.Series) else values
+    return values if rows is None else values[rows]
+
+
+def _resolve(values, length):
+    values = values() if callable(values) else values
+    return [values] * length if isinstance(values, str) or not hasattr(values, '__len__') else values
+
+
+def _buffer(values, dtype, size=1, offsets=None):
+    column = {
+        'dtype': dtype, 'size': size,
+        'data': base64.b64encode(np.ascontiguousarray(values, dtype=dtype).tobytes()).decode('ascii')
+    }
+    if offsets is not None:
+        column['offsets'] = base64.b64encode(np.ascontiguousarray(offsets, dtype=np.int32).tobytes()).decode('ascii')
+    return column
+
+
+def _json_values(values):
+    series = pd.Series(values)
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def _encode_values(values):
+    """Encodes one column as a typed buffer if it is numeric (or fixed-size numeric lists), else as JSON values."""
+    values = values.to_numpy() if isinstance(values, pd.Series) else np.asarray(values) if isinstance(values, list) else values
+    if values.dtype == object and len(values):
+        first = next((v for v in values if isinstance(v, (list, tuple, np.ndarray))), None)
+        if first is not None:
+            try:
+                values = np.array(values.tolist())
+            except (ValueError, TypeError):
+                return {'values': _json_values(values)}
+
+    if values.ndim == 2 and values.dtype.kind in 'iuf':
+        if values.dtype.kind in 'iu':
+            in_byte_range = values.size == 0 or (values.min() >= 0 and values.max() <= 255)
+            return _buffer(values, 'uint8' if in_byte_range else 'int32', size=values.shape[1])
+        return _buffer(values, 'float32', size=values.shape[1])
+    if values.ndim == 1 and values.dtype.kind in 'iu':
+        fits_int32 = values.size == 0 or (values.min() >= -2 ** 31 and values.max() < 2 ** 31)
+        return _buffer(values, 'int32' if fits_int32 else 'float64')
+    if values.ndim == 1 and values.dtype.kind == 'f':
+        return _buffer(values, 'float64')
+    return {'values': _json_values(values if values.ndim == 1 else values.tolist())}
+
+
+def _encode_geometry(base, rows):
+    """
+    Encodes the selected rows' geometry straight from the store as float32
+    positions: polygon exteriors as one vertex buffer plus per-row offsets.
+    """
+    store = get_geometry_store(base)
+    geom_ids = _take(base[GEOMETRY_ID_COLUMN].to_numpy(dtype=np.int64), rows)
+    kinds = store.kinds[geom_ids]
+
+    if len(geom_ids) and (kinds == POLYGON).all():
+        starts, stops = store.exterior_ranges(geom_ids)
+        lengths = stops - starts
+        offsets = np.zeros(len(geom_ids) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        vertices = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return {'contour': _buffer(store.coords[vertices], 'float32', size=2, offsets=offsets)}
+    if len(geom_ids) and (kinds == POINT).all():
+        return {'coordinates': _buffer(store.first_vertices(geom_ids), 'float32', size=2)}
+    if len(geom_ids) and (kinds == LINE).all():
+        sources, targets = store.line_endpoints(geom_ids)
+        return {'source_position': _buffer(sources, 'float32', size=2), 'target_position': _buffer(targets, 'float32', size=2)}
+
+    # Mixed (or no) geometry kinds are sent as the legacy list columns
+    geometry = with_geometry_columns(base[[GEOMETRY_ID_COLUMN]], rows)
+    return {name: {'values': _json_values(geometry[name])} for name in geometry.columns}
+
+
+def encode_layer_data(base, rows=None, columns=None, properties=None):
+    """
+    Returns the deck.gl data for the rows at positions `rows` of `base` (all
+    when None), with `columns` added or replacing base columns, restricted to
+    `properties` plus the geometry. A `columns` value is an array aligned to
+    the rows, a scalar, or a function returning either, called only if the
+    column is sent.
+
+    With DECK_BINARY_TRANSPORT the result is {'length', BINARY_COLUMNS_KEY}
+    where numeric columns, colours and positions are base64 typed arrays;
+    otherwise it is the list of row records.
+    """
+    names = [name for name in dict.fromkeys(list(base.columns) + list(columns or {})) if name != GEOMETRY_ID_COLUMN]
+    if properties is not None:
+        names = [name for name in names if name in properties]
+    length = len(base) if rows is None else len(rows)
+    columns = {name: _resolve(values, length) for name, values in (columns or {}).items() if name in names}
+
+    if not DECK_BINARY_TRANSPORT:
+        out = with_geometry_columns(base, rows, columns=[name for name in names if name in base.columns])
+        for name in out.columns:
+            if is_colour_column(name, out[name]):
+                out[name] = column_colours(out[name].to_numpy()).tolist()
+        for name, values in columns.items():
+            out[name] = values.tolist() if isinstance(values, np.ndarray) and values.ndim == 2 else values
+        # Categoricals keep NaN for missing values through replace()
+        for name in out.select_dtypes(include='category').columns:
+            out[name] = out[name].astype(object)
+        out.replace({pd.NA: None, np.nan: None, pd.NaT: None}, inplace=True)
+        return out.to_dict('records')
+
+    encoded = {}
+    if get_geometry_store(base) is not None and GEOMETRY_ID_COLUMN in base.columns:
+        encoded.update(_encode_geometry(base, rows))
+    for name in names:
+        values = columns[name] if name in columns else _take(base[name], rows)
+        encoded[name] = _encode_values(column_colours(values) if is_colour_column(name, values) else values)
+    return {'length': length, BINARY_COLUMNS_KEY: encoded}
+
+
+def layer_data_hash(data_json):
+    """Returns the content hash identifying a layer's serialised data in the browser's layer cache."""
+    return hashlib.sha1(data_json.encode('utf-8')).hexdigest()[:20]
+
+
+def layer_data_envelope(data_json, data_hash, client_hash=None):
+    """
+    Returns the JSON sent as a layer's data: its hash, plus the data itself
+    unless `client_hash`, the hash of the data the browser holds for the
+    layer, shows it is unchanged.
+    """
+    if data_hash == client_hash:
+        return json.dumps({LAYER_DATA_HASH_KEY: data_hash})
+    return f'{{"{LAYER_DATA_HASH_KEY}": "{data_hash}", "{LAYER_DATA_KEY}": {data_json}}}'
@@ -0,0 +1,55 @@
+# utils/filter_engine.py
+import json
+import pandas as pd
+
+from config import FILTER_CACHE_MAX_BYTES
+from utils.bitmap_index import to_bitmap, intersect, isin_bitmap
+from utils.lru_cache import ByteLRUCache
+from utils.month_index import month_mask
+
+# Row bitmaps by (registry, layer, data version, filter hash). The map and the
+# widget callbacks fired by one Apply click ask for the same filters, so each
+# filter is evaluated once and every other caller reads the cached bitmap
+_rows_cache = ByteLRUCache(FILTER_CACHE_MAX_BYTES)
+
+
+def filter_hash(months=None, isin=None, between=None):
+    """Returns a canonical string of a filter, for keying results derived from its rows."""
+    return json.dumps([months, isin, between], sort_keys=True, default=str)
+
+
+def filter_rows(datasets, layer_key, months=None, isin=None, between=None):
+    """
+    Returns the packed row bitmap (see utils/bitmap_index.py) of the rows of
+    `datasets[layer_key]` passing every given filter, or None when no filter
+    is given (every row):
+
+    - months: a ('YYYY-MM', 'YYYY-MM') range (inclusive) of the month ordinal;
+    - isin: {column: values}, rows whose value is one of `values` (None
+      filters nothing, so pass a cleared dropdown's selection as `selection or None`);
+    - between: {column: [low, high]}, rows whose numeric value lies in the range.
+
+    Results are memoised per layer data version and filter.
+    """
+    isin = {column: list(values) for column, values in (isin or {}).items() if values is not None}
+    between = dict(between or {})
+    if not months and not isin and not between:
+        return None
+
+    key = (id(datasets), layer_key, datasets.data_version(layer_key), filter_hash(months, isin, between))
+    cached = _rows_cache.get(key)
+    if cached is not None:
+        return cached
+
+    df = datasets[layer_key]
+    rows = None
+    if months:
+        rows = to_bitmap(month_mask(df, months[0], months[1]))
+    for column, values in isin.items():
+        rows = intersect(rows, isin_bitmap(df, column, values))
+    for column, (low, high) in between.items():
+        values = pd.to_numeric(df[column], errors='coerce')
+        rows = intersect(rows, to_bitmap(((values >= low) & (values <= high)).to_numpy(dtype=bool)))
+    rows.flags.writeable = False
+    _rows_cache.put(key, rows, rows.nbytes)
+    return rows
@@ -0,0 +1,33 @@
+# utils/frame_cache.py
+import threading
+import weakref
+
+# Structures derived from a frame (category codes, month and bitmap indexes,
+# count cubes, quantile sketches), by (id(frame), key). Each entry holds a weak
+# reference to its frame, which drops the entry when the frame is collected
+# and tells a live frame apart from a dead one whose id was reused.
+_cache = {}
+_lock = threading.RLock()
+
+
+def _evict(ref, key):
+    with _lock:
+        if _cache.get(key, (None,))[0] is ref:
+            del _cache[key]
+
+
+def frame_cache(df, key, build):
+    """
+    Returns build() for `df`, computed on the first call for each `key` and
+    cached while `df` is alive. `df` must not be modified afterwards, as the
+    frames held by the dataset registry never are.
+    """
+    cache_key = (id(df), key)
+    cached = _cache.get(cache_key)
+    if cached is not None and cached[0]() is df:
+        return cached[1]
+
+    value = build()
+    with _lock:
+        _cache[cache_key] = (weakref.ref(df, lambda ref, key=cache_key: _evict(ref, key)), value)
+    return value
@@ -1,78 +1,271 @@
 # utils/geojson_loader.py
 
 import json
+import os
+import re
+import time
 import pandas as pd
 import numpy as np
 
-def process_geojson_features(file_path):
+from config import GEOJSON_STREAMING_MIN_BYTES, GEOJSON_STREAMING_BATCH_SIZE, GEOJSON_STREAMING_CHUNK_BYTES
+from utils.geometry_store import GeometryStoreBuilder, GEOMETRY_ID_COLUMN, attach_geometry_store
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class _JSONStream:
+    """
+    Minimal pull parser over a text file: decodes one JSON value at a time
+    from a sliding buffer so only the current value has to be in memory.
+    """
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Returns the next non-whitespace character without consuming it ('' at EOF)."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self.buf, self.pos)
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A number ending exactly at the buffer edge may be truncated
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def array_items(self):
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            char = self.peek()
+            self.pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise json.JSONDecodeError("Expecting ',' or ']'", self.buf, self.pos - 1)
+
+
+def iter_geojson_features(file_path, chunk_size=GEOJSON_STREAMING_CHUNK_BYTES):
+    """
+    Yields the features of a GeoJSON FeatureCollection (or a bare list of
+    features) one at a time, without parsing the whole file into memory.
+    """
+    with open(file_path, 'r') as f:
+        stream = _JSONStream(f, chunk_size)
+        first = stream.peek()
+        if first == '[':
+            yield from stream.array_items()
+            return
+        stream.expect('{')
+        while stream.peek() not in ('}', ''):
+            key = stream.value()
+            stream.expect(':')
+            if key == 'features' and stream.peek() == '[':
+                yield from stream.array_items()
+                return
+            stream.value()
+            if stream.peek() == ',':
+                stream.pos += 1
+
+
+def iter_geojson_batches(file_path, batch_size=GEOJSON_STREAMING_BATCH_SIZE):
+    """
+    Groups the streamed features of a GeoJSON file into lists of `batch_size`.
+    """
+    batch = []
+    for feature in iter_geojson_features(file_path):
+        batch.append(feature)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class _ColumnBuilder:
+    """
+    Accumulates records column by column and freezes every `batch_size` rows
+    into a DataFrame chunk, so no list of per-row dicts is ever kept around.
+    """
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.columns = {}
+        self.rows = 0
+        self.chunks = []
+
+    def append(self, record):
+        for key, value in record.items():
+            column = self.columns.get(key)
+            if column is None:
+                column = self.columns[key] = [None] * self.rows
+            column.append(value)
+        self.rows += 1
+        if len(record) != len(self.columns):
+            for column in self.columns.values():
+                if len(column) < self.rows:
+                    column.append(None)
+        if self.rows >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.chunks.append(pd.DataFrame(self.columns).replace({np.nan: None}))
+            self.columns = {}
+            self.rows = 0
+
+    def to_frame(self):
+        self.flush()
+        if not self.chunks:
+            return pd.DataFrame()
+        chunks, self.chunks = self.chunks, []
+        df = pd.concat(chunks, ignore_index=True, copy=False)
+        del chunks
+        # Columns missing from some chunks come back as NaN after the concat
+        if df.isna().to_numpy().any():
+            df = df.replace({np.nan: None})
+        return df
+
+
+def _process_feature(feature, builder, emit):
+    """
+    Converts one GeoJSON feature into zero or more records, adding its
+    geometry to `builder` and passing each record to `emit`.
+    """
+    properties = feature.get('properties', {})
+    geometry = feature.get('geometry', {})
+    geom_type = geometry.get('type') if geometry else None
+
+    if geom_type == 'MultiPolygon':
+        for poly_coords in geometry.get('coordinates', []):
+            contour = poly_coords[0]
+            if contour and isinstance(contour, list) and len(contour) >= 3:
+                record = properties.copy()
+                record[GEOMETRY_ID_COLUMN] = builder.add_polygon(poly_coords)
+                emit(record)
+
+    elif geom_type == 'Polygon':
+        coords = geometry.get('coordinates')
+        contour = coords[0] if coords else None
+        if contour and isinstance(contour, list) and len(contour) >= 3:
+            record = properties.copy()
+            record[GEOMETRY_ID_COLUMN] = builder.add_polygon(coords)
+            emit(record)
+
+    elif geom_type == 'Point':
+        coords = geometry.get('coordinates')
+        if coords and isinstance(coords, list) and len(coords) == 2:
+            record = properties.copy()
+            record[GEOMETRY_ID_COLUMN] = builder.add_point(coords[0], coords[1])
+            emit(record)
+
+    elif 'Longitude' in properties and 'Latitude' in properties:
+        lon, lat = properties.get('Longitude'), properties.get('Latitude')
+        if isinstance(lon, (int, float)) and isinstance(lat, (int, float)):
+            record = properties.copy()
+            record[GEOMETRY_ID_COLUMN] = builder.add_point(lon, lat)
+            emit(record)
+
+    elif geom_type == 'LineString':
+        coords = geometry.get('coordinates')
+        if coords and isinstance(coords, list) and len(coords) >= 2:
+            start_point, end_point = coords[0], coords[-1]
+            if (isinstance(start_point, (list, tuple)) and len(start_point) >= 2 and
+                isinstance(end_point, (list, tuple)) and len(end_point) >= 2):
+                record = properties.copy()
+                record[GEOMETRY_ID_COLUMN] = builder.add_line(start_point, end_point)
+                emit(record)
+
+
+def process_geojson_features(file_path, streaming=None, batch_size=GEOJSON_STREAMING_BATCH_SIZE):
     """
     Loads a GeoJSON file and processes its features, correctly handling
     Polygons, MultiPolygons, Points, and LineStrings.
+    Geometries go into a columnar GeometryStore attached to the returned
+    DataFrame; each row references its geometry through the 'geom_id' column.
+
+    With `streaming=True` features are parsed one at a time and fed in batches
+    into column builders, so peak memory follows the final DataFrame instead of
+    the full JSON tree. By default streaming is used for files of at least
+    GEOJSON_STREAMING_MIN_BYTES.
     """
+    if streaming is None:
+        try:
+            streaming = os.path.getsize(file_path) >= GEOJSON_STREAMING_MIN_BYTES
+        except OSError:
+            streaming = False
+
+    start_time = time.perf_counter()
+    feature_count = 0
+    builder = GeometryStoreBuilder()
+
     try:
-        with open(file_path, 'r') as f:
-            geojson_data = json.load(f)
+        if streaming:
+            columns = _ColumnBuilder(batch_size)
+            for batch in iter_geojson_batches(file_path, batch_size):
+                for feature in batch:
+                    _process_feature(feature, builder, columns.append)
+                feature_count += len(batch)
+            df = columns.to_frame()
+            del columns
+        else:
+            with open(file_path, 'r') as f:
+                geojson_data = json.load(f)
+
+            features = geojson_data.get('features', []) if isinstance(geojson_data, dict) else []
+            if not features and isinstance(geojson_data, list):
+                features = geojson_data
+
+            processed_data = []
+            for feature in features:
+                _process_feature(feature, builder, processed_data.append)
+            feature_count = len(features)
+            del geojson_data, features
+            df = pd.DataFrame(processed_data).replace({np.nan: None})
     except (FileNotFoundError, json.JSONDecodeError) as e:
         print(f"Error loading {file_path}: {e}")
         return pd.DataFrame()
 
-    features = geojson_data.get('features', [])
-    if not features and isinstance(geojson_data, list):
-        features = geojson_data
-
-    processed_data = []
-    for feature in features:
-        properties = feature.get('properties', {})
-        geometry = feature.get('geometry', {})
-        geom_type = geometry.get('type') if geometry else None
-        
-        if geom_type == 'MultiPolygon':
-            for poly_coords in geometry.get('coordinates', []):
-                contour = poly_coords[0]
-                if contour and isinstance(contour, list) and len(contour) >= 3:
-                    record = properties.copy()
-                    record['contour'] = contour
-                    processed_data.append(record)
-        
-        elif geom_type == 'Polygon':
-            coords = geometry.get('coordinates')
-            contour = coords[0] if coords else None
-            if contour and isinstance(contour, list) and len(contour) >= 3:
-                record = properties.copy()
-                record['contour'] = contour
-                processed_data.append(record)
-        
-        elif geom_type == 'Point':
-            coords = geometry.get('coordinates')
-            if coords and isinstance(coords, list) and len(coords) == 2:
-                record = properties.copy()
-                record['coordinates'] = coords
-                processed_data.append(record)
+    elapsed = time.perf_counter() - start_time
+    rate = feature_count / elapsed if elapsed > 0 else float(feature_count)
+    mode = "streamed" if streaming else "parsed"
+    print(f"{mode.capitalize()} {feature_count:,} features from {file_path} in {elapsed:.2f}s ({rate:,.0f} features/s)")
 
-        elif 'Longitude' in properties and 'Latitude' in properties:
-            lon, lat = properties.get('Longitude'), properties.get('Latitude')
-            if isinstance(lon, (int, float)) and isinstance(lat, (int, float)):
-                record = properties.copy()
-                record['coordinates'] = [lon, lat]
-                processed_data.append(record)
-        
-        elif geom_type == 'LineString':
-            coords = geometry.get('coordinates')
-            if coords and isinstance(coords, list) and len(coords) >= 2:
-                start_point, end_point = coords[0], coords[-1]
-                if (isinstance(start_point, (list, tuple)) and len(start_point) >= 2 and
-                    isinstance(end_point, (list, tuple)) and len(end_point) >= 2):
-                    record = properties.copy()
-                    record['source_position'], record['target_position'] = start_point, end_point
-                    processed_data.append(record)
-
-    if not processed_data:
+    if df.empty:
         return pd.DataFrame()
 
-    df = pd.DataFrame(processed_data)
-    # Final check to ensure contour is valid before returning
-    if 'contour' in df.columns:
-        df = df[df['contour'].apply(lambda x: isinstance(x, list) and len(x) > 0)]
-
-    df = df.replace({np.nan: None})
-    return df
+    return attach_geometry_store(df, builder.build())
@@ -1,24 +1,95 @@
 # utils/geometry.py
+import numpy as np
 
-def is_point_in_polygon(point, polygon):
+# Upper bound on the (point, edge) pairs evaluated at once by points_in_polygon
+_MAX_PAIRS_PER_CHUNK = 4 * 1024 * 1024
+
+
+def _depth(value):
+    # 1 for a vertex, 2 for a ring, 3 for a polygon, 4 for a multipolygon
+    depth = 0
+    while hasattr(value, '__len__') and not isinstance(value, str):
+        if len(value) == 0:
+            return depth + 1
+        value, depth = value[0], depth + 1
+    return depth
+
+
+def polygon_rings(polygon):
     """
-    Checks if a point is inside a given polygon using the Ray-Casting algorithm.
+    Returns every ring of `polygon` as an (n, 2) float array: exteriors and
+    holes of all its parts alike. `polygon` is a shapely Polygon or
+    MultiPolygon, a single ring, a polygon as [exterior, *holes], or a
+    multipolygon as a list of such polygons (GeoJSON coordinate nesting).
+    """
+    if hasattr(polygon, 'geom_type'):
+        parts = getattr(polygon, 'geoms', [polygon])
+        return [np.asarray(ring.coords, dtype=np.float64)[:, :2] for part in parts for ring in [part.exterior, *part.interiors]]
+    depth = _depth(polygon)
+    if depth == 2:
+        polygon = [polygon]
+    elif depth == 4:
+        polygon = [ring for part in polygon for ring in part]
+    return [np.asarray(ring, dtype=np.float64).reshape(-1, 2)[:, :2] for ring in polygon if len(ring)]
+
+
+def points_in_polygon(coords, polygon, bbox=True):
     """
-    lon, lat = point
-    vertices = polygon
-    n = len(vertices)
-    inside = False
-
-    p1_lon, p1_lat = vertices[0]
-    for i in range(n + 1):
-        p2_lon, p2_lat = vertices[i % n]
-        if lat > min(p1_lat, p2_lat):
-            if lat <= max(p1_lat, p2_lat):
-                if lon <= max(p1_lon, p2_lon):
-                    if p1_lat != p2_lat:
-                        xinters = (lat - p1_lat) * (p2_lon - p1_lon) / (p2_lat - p1_lat) + p1_lon
-                    if p1_lon == p2_lon or lon <= xinters:
-                        inside = not inside
-        p1_lon, p1_lat = p2_lon, p2_lat
+    Returns a boolean mask of the points in the (N, 2) `coords` array lying
+    inside `polygon` (any form accepted by polygon_rings), by even-odd
+    crossing numbers over all its rings, so holes and multipolygon parts
+    need no special handling. Edge and vertex cases follow
+    is_point_in_polygon. With `bbox`, points outside the polygon's bounding
+    box are rejected before the crossing test. Points with NaN coordinates
+    are outside.
+    """
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    inside = np.zeros(len(coords), dtype=bool)
+    rings = polygon_rings(polygon)
+    if not rings or not len(coords):
+        return inside
+
+    # Edges (p1, p2) of every ring, each ring closed back to its first vertex
+    p1 = np.concatenate(rings)
+    p2 = np.concatenate([np.roll(ring, -1, axis=0) for ring in rings])
+    x1, y1, x2, y2 = p1[:, 0], p1[:, 1], p2[:, 0], p2[:, 1]
+    y_min, y_max, x_max = np.minimum(y1, y2), np.maximum(y1, y2), np.maximum(x1, x2)
+    vertical = x1 == x2
+    # Horizontal edges span no point (y_min < y <= y_max), so their divisor only has to be non-zero
+    dx, dy = x2 - x1, np.where(y1 == y2, 1.0, y2 - y1)
+
+    candidates = np.arange(len(coords))
+    if bbox:
+        x, y = coords[:, 0], coords[:, 1]
+        candidates = np.flatnonzero((x >= p1[:, 0].min()) & (x <= x_max.max()) & (y >= y_min.min()) & (y <= y_max.max()))
+    if not len(candidates):
+        return inside
+    x, y = coords[candidates, 0], coords[candidates, 1]
 
+    # With the points sorted by y, the points an edge can cross (y_min < y <= y_max)
+    # are one run of the order, found by binary search; only those pairs are tested
+    order = np.argsort(y, kind='stable')
+    first = np.searchsorted(y[order], y_min, side='right')
+    spans = np.searchsorted(y[order], y_max, side='right') - first
+    ends = np.cumsum(spans)
+    crossings = np.zeros(len(candidates), dtype=np.int64)
+    edge_start = 0
+    while edge_start < len(p1):
+        pair_start = ends[edge_start - 1] if edge_start else 0
+        edge_stop = max(edge_start + 1, int(np.searchsorted(ends, pair_start + _MAX_PAIRS_PER_CHUNK, side='right')))
+        edges = np.repeat(np.arange(edge_start, edge_stop), spans[edge_start:edge_stop])
+        points = order[np.arange(pair_start, ends[edge_stop - 1]) - (ends - spans)[edges] + first[edges]]
+        px, py = x[points], y[points]
+        crosses = (px <= x_max[edges]) & (vertical[edges] | (px <= (py - y1[edges]) * dx[edges] / dy[edges] + x1[edges]))
+        crossings += np.bincount(points[crosses], minlength=len(candidates))
+        edge_start = edge_stop
+    inside[candidates] = crossings % 2 == 1
     return inside
+
+
+def is_point_in_polygon(point, polygon):
+    """
+    Checks if a point is inside a given polygon using the Ray-Casting algorithm.
+    For many points, use points_in_polygon.
+    """
+    return bool(points_in_polygon([point], polygon, bbox=False)[0])
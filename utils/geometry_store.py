@@ -0,0 +1,243 @@
+# utils/geometry_store.py
+
+from array import array
+import os
+import numpy as np
+
+# Geometry kinds stored per feature
+POLYGON, POINT, LINE = 0, 1, 2
+
+# Column added to every loaded DataFrame, pointing at its feature in the store
+GEOMETRY_ID_COLUMN = 'geom_id'
+
+# Key under which the store is attached to DataFrame.attrs
+GEOMETRY_ATTR = 'geometry'
+
+# Per-row list columns produced by the original loader (and by older Parquet files)
+LEGACY_GEOMETRY_COLUMNS = ['contour', 'coordinates', 'source_position', 'target_position']
+
+_STORE_ARRAYS = ('coords', 'ring_offsets', 'feature_offsets', 'kinds')
+
+
+class GeometryStore:
+    """
+    Immutable columnar store for feature geometries.
+
+    All vertices live in one contiguous float64 (V, 2) buffer. `ring_offsets`
+    holds the start vertex of every ring (plus a final end offset) and
+    `feature_offsets` holds the first ring of every feature, so feature `i`
+    owns rings `feature_offsets[i]:feature_offsets[i + 1]`. Points are stored
+    as a single one-vertex ring and lines as a two-vertex (source, target) ring.
+    """
+
+    def __init__(self, coords, ring_offsets, feature_offsets, kinds):
+        self.coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        self.ring_offsets = np.asarray(ring_offsets, dtype=np.int64)
+        self.feature_offsets = np.asarray(feature_offsets, dtype=np.int64)
+        self.kinds = np.asarray(kinds, dtype=np.uint8)
+        for arr in (self.coords, self.ring_offsets, self.feature_offsets, self.kinds):
+            if arr.flags.owndata:
+                arr.flags.writeable = False
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __deepcopy__(self, memo):
+        # The store is read-only, so DataFrame.attrs propagation can share it
+        return self
+
+    def save(self, directory):
+        """Writes the buffers as .npy files so they can later be memory-mapped."""
+        os.makedirs(directory, exist_ok=True)
+        for name in _STORE_ARRAYS:
+            np.save(os.path.join(directory, f'{name}.npy'), getattr(self, name))
+
+    @classmethod
+    def load(cls, directory, mmap_mode=None):
+        return cls(*(np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode) for name in _STORE_ARRAYS))
+
+    @property
+    def nbytes(self):
+        return self.coords.nbytes + self.ring_offsets.nbytes + self.feature_offsets.nbytes + self.kinds.nbytes
+
+    # --- Per-feature access (views, no copies) ---
+    def rings(self, geom_id):
+        """Returns every ring of a feature as (n, 2) views, exterior first."""
+        first, last = self.feature_offsets[geom_id], self.feature_offsets[geom_id + 1]
+        return [self.coords[self.ring_offsets[r]:self.ring_offsets[r + 1]] for r in range(first, last)]
+
+    # --- Vectorised access over many features ---
+    def first_vertices(self, geom_ids):
+        """Returns the first vertex of each feature as an (n, 2) array (point positions)."""
+        geom_ids = np.asarray(geom_ids, dtype=np.int64)
+        return self.coords[self.ring_offsets[self.feature_offsets[geom_ids]]]
+
+    def line_endpoints(self, geom_ids):
+        """Returns (source, target) (n, 2) arrays for line features."""
+        starts = self.ring_offsets[self.feature_offsets[np.asarray(geom_ids, dtype=np.int64)]]
+        return self.coords[starts], self.coords[starts + 1]
+
+    def exterior_ranges(self, geom_ids):
+        """Returns (start, stop) vertex offsets of each feature's exterior ring."""
+        rings = self.feature_offsets[np.asarray(geom_ids, dtype=np.int64)]
+        return self.ring_offsets[rings], self.ring_offsets[rings + 1]
+
+    # --- Materialisation for JSON serialisation ---
+    def exteriors_as_lists(self, geom_ids):
+        """Returns the exterior ring of each feature as nested Python lists."""
+        starts, stops = self.exterior_ranges(geom_ids)
+        return [self.coords[a:b].tolist() for a, b in zip(starts, stops)]
+
+
+class GeometryStoreBuilder:
+    """
+    Accumulates geometries feature by feature into flat typed buffers and
+    freezes them into a GeometryStore.
+    """
+
+    def __init__(self):
+        self._coords = array('d')
+        self._ring_offsets = array('q', [0])
+        self._feature_offsets = array('q', [0])
+        self._kinds = array('B')
+
+    def __len__(self):
+        return len(self._kinds)
+
+    def _add_ring(self, ring):
+        try:
+            xy = np.asarray(ring, dtype=np.float64)
+            if xy.ndim != 2 or xy.shape[1] < 2:
+                raise ValueError
+        except (ValueError, TypeError):
+            # Ragged rings (e.g. mixed 2D/3D positions) fall back to a per-vertex copy
+            xy = np.array([[p[0], p[1]] for p in ring], dtype=np.float64)
+        self._coords.frombytes(np.ascontiguousarray(xy[:, :2]).tobytes())
+        self._ring_offsets.append(len(self._coords) // 2)
+
+    def _finish_feature(self, kind):
+        self._feature_offsets.append(len(self._ring_offsets) - 1)
+        self._kinds.append(kind)
+        return len(self._kinds) - 1
+
+    def add_polygon(self, rings):
+        """Adds a polygon given as [exterior, *holes] and returns its geometry id."""
+        for ring in rings:
+            if ring is not None and len(ring) > 0:
+                self._add_ring(ring)
+        return self._finish_feature(POLYGON)
+
+    def add_point(self, lon, lat):
+        self._coords.extend((float(lon), float(lat)))
+        self._ring_offsets.append(len(self._coords) // 2)
+        return self._finish_feature(POINT)
+
+    def add_line(self, source, target):
+        self._coords.extend((float(source[0]), float(source[1]), float(target[0]), float(target[1])))
+        self._ring_offsets.append(len(self._coords) // 2)
+        return self._finish_feature(LINE)
+
+    def build(self):
+        return GeometryStore(
+            np.frombuffer(self._coords, dtype=np.float64).copy(),
+            np.frombuffer(self._ring_offsets, dtype=np.int64).copy(),
+            np.frombuffer(self._feature_offsets, dtype=np.int64).copy(),
+            np.frombuffer(self._kinds, dtype=np.uint8).copy()
+        )
+
+
+def get_geometry_store(df):
+    """
+    Returns the GeometryStore attached to a DataFrame, or None.
+    """
+    if df is None:
+        return None
+    return df.attrs.get(GEOMETRY_ATTR)
+
+
+def attach_geometry_store(df, store):
+    """
+    Attaches a store to a DataFrame whose GEOMETRY_ID_COLUMN indexes into it.
+    """
+    df.attrs[GEOMETRY_ATTR] = store
+    return df
+
+
+def geometry_store_from_legacy_columns(df):
+    """
+    Converts a frame with per-row list geometry columns (e.g. a hand-made
+    Parquet file) into a frame with a GEOMETRY_ID_COLUMN and an attached store.
+    """
+    legacy = [col for col in LEGACY_GEOMETRY_COLUMNS if col in df.columns]
+    if not legacy or GEOMETRY_ID_COLUMN in df.columns:
+        return df
+
+    def present(value):
+        return value is not None and not (isinstance(value, float) and np.isnan(value)) and len(value) > 0
+
+    builder = GeometryStoreBuilder()
+    geom_ids = np.full(len(df), -1, dtype=np.int64)
+    contours = df['contour'] if 'contour' in df.columns else None
+    points = df['coordinates'] if 'coordinates' in df.columns else None
+    sources = df['source_position'] if 'source_position' in df.columns else None
+    targets = df['target_position'] if 'target_position' in df.columns else None
+
+    for i in range(len(df)):
+        if contours is not None and present(contours.iat[i]):
+            geom_ids[i] = builder.add_polygon([list(contours.iat[i])])
+        elif points is not None and present(points.iat[i]):
+            geom_ids[i] = builder.add_point(points.iat[i][0], points.iat[i][1])
+        elif sources is not None and targets is not None and present(sources.iat[i]) and present(targets.iat[i]):
+            geom_ids[i] = builder.add_line(sources.iat[i], targets.iat[i])
+
+    df = df.drop(columns=legacy)
+    df = df[geom_ids >= 0].copy()
+    df[GEOMETRY_ID_COLUMN] = geom_ids[geom_ids >= 0]
+    return attach_geometry_store(df, builder.build())
+
+
+def with_geometry_columns(df, rows=None, columns=None):
+    """
+    Returns a copy of `df` (or of only the rows at positions `rows`, and only
+    its `columns`) with the legacy list columns ('contour', 'coordinates',
+    'source_position', 'target_position') materialised from the store, ready
+    for pydeck's records serialisation. The selection is copied once; `df` is
+    left untouched.
+    """
+    keep = [pos for pos, col in enumerate(df.columns) if col != GEOMETRY_ID_COLUMN and (columns is None or col in columns)]
+    store = get_geometry_store(df)
+    if store is None or GEOMETRY_ID_COLUMN not in df.columns:
+        return df.iloc[slice(None) if rows is None else rows, keep].copy()
+
+    geom_ids = df[GEOMETRY_ID_COLUMN].to_numpy(dtype=np.int64)
+    if rows is None:
+        out = df.iloc[:, keep].copy()
+    else:
+        geom_ids = geom_ids[rows]
+        out = df.iloc[rows, keep]
+    kinds = store.kinds[geom_ids]
+
+    def fill(mask, values):
+        column = [None] * len(geom_ids)
+        for pos, value in zip(np.flatnonzero(mask), values):
+            column[pos] = value
+        return column
+
+    polygon_mask = kinds == POLYGON
+    if polygon_mask.any():
+        contours = store.exteriors_as_lists(geom_ids[polygon_mask])
+        out['contour'] = contours if polygon_mask.all() else fill(polygon_mask, contours)
+
+    point_mask = kinds == POINT
+    if point_mask.any():
+        points = store.first_vertices(geom_ids[point_mask]).tolist()
+        out['coordinates'] = points if point_mask.all() else fill(point_mask, points)
+
+    line_mask = kinds == LINE
+    if line_mask.any():
+        sources, targets = store.line_endpoints(geom_ids[line_mask])
+        sources, targets = sources.tolist(), targets.tolist()
+        out['source_position'] = sources if line_mask.all() else fill(line_mask, sources)
+        out['target_position'] = targets if line_mask.all() else fill(line_mask, targets)
+
+    return out
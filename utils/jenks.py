@@ -0,0 +1,58 @@
+# utils/jenks.py
+import hashlib
+import time
+import numpy as np
+import jenkspy
+
+from config import JENKS_EXACT_MAX_VALUES, JENKS_CACHE_MAX_BYTES
+from utils.lru_cache import ByteLRUCache
+
+# Breaks keyed by a digest of the values and the number of classes, so every
+# caller classifying the same data (the same filtered column) shares one result
+_breaks_cache = ByteLRUCache(JENKS_CACHE_MAX_BYTES)
+
+
+def goodness_of_variance_fit(sorted_values, breaks):
+    """
+    Returns the goodness of variance fit (1 - within-class / total sum of
+    squared deviations) of classifying the ascending `sorted_values` by
+    `breaks`, with classes closed on the right and the first one also on the left.
+    """
+    total = np.square(sorted_values - sorted_values.mean()).sum() if len(sorted_values) else 0
+    if total == 0:
+        return 1.0
+    bounds = np.searchsorted(sorted_values, breaks[1:-1], side='right')
+    sizes = np.diff(np.concatenate([[0], bounds, [len(sorted_values)]]))
+    classes = np.repeat(np.arange(len(sizes)), sizes)
+    means = np.bincount(classes, weights=sorted_values, minlength=len(sizes)) / np.maximum(sizes, 1)
+    within = np.square(sorted_values - means[classes]).sum()
+    return float(max(0.0, 1 - within / total))
+
+
+def natural_breaks(values, n_classes):
+    """
+    Returns (breaks, gvf): the n_classes + 1 Jenks natural breaks of the
+    finite `values` (as jenkspy.jenks_breaks) and their goodness of variance
+    fit. Above JENKS_EXACT_MAX_VALUES values the breaks are computed on that
+    many evenly spaced order statistics, which keep the minimum and maximum,
+    and the fit reported is that of the full data. Results are memoised, and
+    each one computed is reported with its fit.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = np.sort(values[np.isfinite(values)])
+    key = (hashlib.blake2b(values.tobytes(), digest_size=16).hexdigest(), n_classes)
+    cached = _breaks_cache.get(key)
+    if cached is not None:
+        return cached
+
+    start_time = time.perf_counter()
+    sample = values
+    if len(values) > JENKS_EXACT_MAX_VALUES:
+        sample = values[np.linspace(0, len(values) - 1, JENKS_EXACT_MAX_VALUES).round().astype(np.int64)]
+    breaks = [float(b) for b in jenkspy.jenks_breaks(sample, n_classes=n_classes)]
+    gvf = goodness_of_variance_fit(values, breaks)
+    approximated = f", approximated from {len(sample)}" if sample is not values else ""
+    print(f"Jenks breaks: {n_classes} classes for {len(values)} values{approximated} in {time.perf_counter() - start_time:.2f}s (GVF {gvf:.3f})")
+
+    _breaks_cache.put(key, (breaks, gvf), 8 * len(breaks) + 64)
+    return breaks, gvf
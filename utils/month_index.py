@@ -0,0 +1,68 @@
+# utils/month_index.py
+import numpy as np
+import pandas as pd
+
+from utils.frame_cache import frame_cache
+
+# Integer month number (year * 12 + month - 1) added to crime and stop & search
+# frames at load time. Records with no parseable month get MISSING_MONTH, which
+# sorts before every real month, so no time range selects them.
+MONTH_ORDINAL_COLUMN = 'month_ordinal'
+MISSING_MONTH = -1
+
+def month_ordinals(month_dt):
+    """Returns the int32 month ordinals of a datetime Series (MISSING_MONTH where it is NaT)."""
+    ordinals = (month_dt.dt.year * 12 + month_dt.dt.month - 1).fillna(MISSING_MONTH)
+    return ordinals.to_numpy(dtype=np.int32)
+
+
+def month_ordinal(month_str):
+    """Returns the ordinal of a 'YYYY-MM' month string from a month map store."""
+    month = pd.Timestamp(month_str)
+    return month.year * 12 + month.month - 1
+
+
+def slider_month_range(slider_range, month_map):
+    """
+    Returns the ('YYYY-MM', 'YYYY-MM') months selected by a time slider's
+    [start, end] value through its month map store, or None for no range.
+    """
+    if not slider_range or not isinstance(slider_range, list) or len(slider_range) != 2 or not month_map:
+        return None
+    start_month_str, end_month_str = month_map.get(str(slider_range[0])), month_map.get(str(slider_range[1]))
+    return (start_month_str, end_month_str) if start_month_str and end_month_str else None
+
+
+def month_index(df):
+    """
+    Returns (sorted_ordinals, order) for `df`'s month ordinals, where `order`
+    is None when the frame is already sorted by month (as the loader leaves
+    it), else the stable argsort. Cached per frame (see utils/frame_cache.py).
+    """
+    def build():
+        ordinals = df[MONTH_ORDINAL_COLUMN].to_numpy()
+        order = None
+        if len(ordinals) > 1 and (np.diff(ordinals) < 0).any():
+            order = np.argsort(ordinals, kind='stable')
+            ordinals = ordinals[order]
+        return ordinals, order
+    return frame_cache(df, 'month_index', build)
+
+
+def month_rows(df, start_month_str, end_month_str):
+    """
+    Returns the rows of `df` whose month lies between the two 'YYYY-MM' months
+    (inclusive), found by binary search over the month index: a slice when
+    the frame is sorted by month, else an array of row positions.
+    """
+    ordinals, order = month_index(df)
+    start = np.searchsorted(ordinals, month_ordinal(start_month_str), side='left')
+    stop = np.searchsorted(ordinals, month_ordinal(end_month_str), side='right')
+    return slice(start, stop) if order is None else np.sort(order[start:stop])
+
+
+def month_mask(df, start_month_str, end_month_str):
+    """Returns a boolean mask over `df` selecting the rows month_rows() finds."""
+    mask = np.zeros(len(df), dtype=bool)
+    mask[month_rows(df, start_month_str, end_month_str)] = True
+    return mask
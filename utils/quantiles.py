@@ -0,0 +1,88 @@
+# utils/quantiles.py
+import numpy as np
+import pandas as pd
+
+from utils.frame_cache import frame_cache
+
+
+class ColumnQuantiles:
+    """
+    The finite values of one numeric column in ascending order: an exact
+    quantile sketch answering quantile, decile and histogram queries over any
+    value range by binary search, without filtering or sorting the rows again.
+    """
+
+    def __init__(self, values):
+        values = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=np.float64)
+        self.sorted = np.sort(values[np.isfinite(values)])
+        self.sorted.flags.writeable = False
+
+    @property
+    def nbytes(self):
+        return self.sorted.nbytes
+
+    def values(self, value_range=None):
+        """Returns the sorted values within `value_range`, a [low, high] pair (inclusive), or all of them."""
+        if value_range is None:
+            return self.sorted
+        start = np.searchsorted(self.sorted, value_range[0], side='left')
+        stop = np.searchsorted(self.sorted, value_range[1], side='right')
+        return self.sorted[start:max(start, stop)]
+
+    def quantile_edges(self, n_quantiles, value_range=None):
+        """
+        Returns the distinct edges splitting the values within `value_range`
+        into `n_quantiles` equal-count classes, as pd.qcut(values, n_quantiles,
+        duplicates='drop') bins them (linear interpolation between order statistics).
+        """
+        values = self.values(value_range)
+        if not len(values):
+            return np.array([])
+        # pd.qcut passes the fractions to Series.quantile, which calls np.percentile(values, fractions * 100),
+        # which divides them by 100 again. The round trip is not exact in floating point (0.7000000000000001
+        # comes back as 0.7), so it is repeated here for the edges to match pd.qcut's to the last bit;
+        # np.percentile's linear interpolation is repeated below for the same reason
+        positions = (np.linspace(0, 1, n_quantiles + 1) * 100 / 100) * (len(values) - 1)
+        below = np.floor(positions).astype(np.int64)
+        above = np.minimum(below + 1, len(values) - 1)
+        fraction = positions - below
+        step = values[above] - values[below]
+        edges = np.where(fraction >= 0.5, values[above] - step * (1 - fraction), values[below] + step * fraction)
+        return np.unique(edges)
+
+    def decile_edges(self, value_range=None):
+        """Returns quantile_edges(10, value_range)."""
+        return self.quantile_edges(10, value_range)
+
+    def histogram(self, bins, value_range=None):
+        """Returns (counts, edges) of the values within `value_range`, as np.histogram(values, bins)."""
+        values = self.values(value_range)
+        low, high = (values[0], values[-1]) if len(values) else (0.0, 1.0)
+        if low == high:
+            low, high = low - 0.5, high + 0.5
+        edges = np.linspace(low, high, bins + 1)
+        # Bins are closed on the left, and the last one on the right too
+        positions = np.searchsorted(values, edges, side='left')
+        positions[-1] = len(values)
+        return np.diff(positions), edges
+
+
+def quantile_classes(values, edges):
+    """
+    Returns the class (0 for the lowest) of each of `values` between the
+    quantile `edges`, like pd.qcut(..., labels=False) with those bins;
+    values outside the edges get -1.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    classes = np.searchsorted(edges, values, side='left') - 1
+    classes[values == edges[0]] = 0
+    classes[(classes < 0) | (classes >= len(edges) - 1) | np.isnan(values)] = -1
+    return classes
+
+
+def column_quantiles(df, column):
+    """
+    Returns the ColumnQuantiles of `df[column]`, cached per frame and column
+    (see utils/frame_cache.py).
+    """
+    return frame_cache(df, ('column_quantiles', column), lambda: ColumnQuantiles(df[column]))
@@ -0,0 +1,103 @@
+# utils/session_store.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from config import SESSION_STORE_BACKEND, SESSION_STORE_PATH, SESSION_STORE_MAX_BYTES
+from utils.lru_cache import ByteLRUCache
+
+# Callback state that would otherwise travel through the browser in dcc.Store
+# JSON (the map update trigger, month maps, the clicked neighbourhood) is kept
+# here, and the stores hold only its key. Keys are digests of the state, so
+# equal states share one entry and a key is valid in any session or process
+# that can reach the backend.
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def state_key(state):
+    """Returns the key of a JSON-serialisable state: a digest of its canonical JSON."""
+    return hashlib.blake2b(json.dumps(state, sort_keys=True, default=str).encode(), digest_size=16).hexdigest()
+
+
+class MemorySessionStore:
+    """States held in this process, least recently used first out past SESSION_STORE_MAX_BYTES."""
+
+    def __init__(self, max_bytes):
+        self._cache = ByteLRUCache(max_bytes)
+
+    def put(self, state):
+        """Stores `state` and returns its key."""
+        data = json.dumps(state, default=str)
+        key = state_key(state)
+        self._cache.put(key, data, len(data))
+        return key
+
+    def get(self, key, default=None):
+        """Returns the state stored under `key`, or `default` if it is unknown or was evicted."""
+        data = self._cache.get(key) if key else None
+        return json.loads(data) if data is not None else default
+
+
+class SQLiteSessionStore:
+    """
+    States in an SQLite file, so every worker process of a deployment sees
+    them. The least recently used are deleted past SESSION_STORE_MAX_BYTES.
+    """
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connection() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS states (key TEXT PRIMARY KEY, data TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)")
+
+    def _connection(self):
+        # One connection per thread and process, as sqlite3 connections may not be
+        # shared across threads, nor used by a worker forked from the process that opened them
+        connection, pid = getattr(self._local, 'connection', (None, None))
+        if connection is None or pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=10)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = (connection, os.getpid())
+        return connection
+
+    def put(self, state):
+        """Stores `state` and returns its key."""
+        data = json.dumps(state, default=str)
+        key = state_key(state)
+        with self._connection() as connection:
+            connection.execute("INSERT OR REPLACE INTO states VALUES (?, ?, ?, ?)", (key, data, len(data), time.time()))
+            connection.execute(
+                "DELETE FROM states WHERE key IN (SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY accessed DESC, key) AS total FROM states) WHERE total > ?)",
+                (self.max_bytes,)
+            )
+        return key
+
+    def get(self, key, default=None):
+        """Returns the state stored under `key`, or `default` if it is unknown or was deleted."""
+        if not key:
+            return default
+        with self._connection() as connection:
+            row = connection.execute("SELECT data FROM states WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                connection.execute("UPDATE states SET accessed = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0]) if row is not None else default
+
+
+def get_session_store():
+    """Returns the process's session store, with the backend chosen by SESSION_STORE_BACKEND ('memory' or 'sqlite')."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if SESSION_STORE_BACKEND == 'sqlite':
+                    _store = SQLiteSessionStore(SESSION_STORE_PATH, SESSION_STORE_MAX_BYTES)
+                else:
+                    _store = MemorySessionStore(SESSION_STORE_MAX_BYTES)
+    return _store
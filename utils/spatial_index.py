@@ -0,0 +1,82 @@
+# utils/spatial_index.py
+import numpy as np
+import pandas as pd
+import shapely
+
+from utils.geometry import points_in_polygon
+from utils.geometry_store import get_geometry_store, GEOMETRY_ID_COLUMN, POLYGON, POINT
+
+
+def feature_polygon(store, geom_id):
+    """Returns a feature of a geometry store as a shapely Polygon, holes included."""
+    rings = store.rings(geom_id)
+    return shapely.Polygon(rings[0], rings[1:])
+
+
+def _polygon_points(store, geom_ids):
+    # One point inside each polygon, like Polygon.representative_point()
+    try:
+        polygons = [feature_polygon(store, geom_id) for geom_id in geom_ids]
+        return shapely.get_coordinates(shapely.point_on_surface(polygons))
+    except (ValueError, shapely.errors.GEOSException):
+        # Degenerate rings: fall back to the mean of each exterior's vertices
+        starts, stops = store.exterior_ranges(geom_ids)
+        return np.array([store.coords[a:b].mean(axis=0) if b > a else [np.nan, np.nan] for a, b in zip(starts, stops)])
+
+
+def row_positions(df):
+    """
+    Returns an (N, 2) array with one position per row of `df`: the point of
+    point features, a point inside polygon features, or the 'Longitude' /
+    'Latitude' columns of frames without polygon or point geometry.
+    """
+    store = get_geometry_store(df)
+    if store is not None and GEOMETRY_ID_COLUMN in df.columns and len(df):
+        geom_ids = df[GEOMETRY_ID_COLUMN].to_numpy(dtype=np.int64)
+        kinds = store.kinds[geom_ids]
+        if (kinds == POINT).all():
+            return store.first_vertices(geom_ids)
+        if (kinds == POLYGON).all():
+            return _polygon_points(store, geom_ids)
+    if 'Longitude' in df.columns and 'Latitude' in df.columns:
+        return np.column_stack([
+            pd.to_numeric(df['Longitude'], errors='coerce').to_numpy(dtype=np.float64),
+            pd.to_numeric(df['Latitude'], errors='coerce').to_numpy(dtype=np.float64)
+        ])
+    return np.full((len(df), 2), np.nan)
+
+
+class SpatialIndex:
+    """
+    STRtree over one position per row of a frame (see row_positions), for
+    "which rows lie inside this polygon" queries: the tree's bounding box
+    search picks the candidates, which are then tested exactly with the
+    vectorised points_in_polygon kernel. Rows without a position are never returned.
+    """
+
+    def __init__(self, df):
+        positions = row_positions(df)
+        self._rows = np.flatnonzero(np.isfinite(positions).all(axis=1))
+        self._positions = positions[self._rows]
+        self._tree = shapely.STRtree(shapely.points(self._positions))
+
+    def __len__(self):
+        return len(self._rows)
+
+    def rows_within(self, polygon):
+        """Returns the sorted positions of the rows inside `polygon` (a shapely geometry)."""
+        candidates = self._tree.query(polygon)
+        inside = points_in_polygon(self._positions[candidates], polygon, bbox=False)
+        return np.sort(self._rows[candidates[inside]])
+
+
+def polygon_membership(df, polygons):
+    """
+    Returns, for each row of `df`, the index in `polygons` of the first
+    polygon containing its position (see row_positions), or -1 if none does.
+    """
+    index = SpatialIndex(df)
+    membership = np.full(len(df), -1, dtype=np.int32)
+    for k in range(len(polygons) - 1, -1, -1):
+        membership[index.rows_within(polygons[k])] = k
+    return membership